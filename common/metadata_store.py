@@ -7,16 +7,28 @@ Copyright (c) 2025 laplaque/instana_plugins Contributors
 
 This file is part of the Instana Plugins collection.
 """
-from common.logging_config import setup_logging
-
-setup_logging()  # Configure logging at the start of the module
 import os
 import sqlite3
 import uuid
 import logging
 import re
+import atexit
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from functools import lru_cache
 from datetime import datetime
-from typing import Dict, Any, Optional, Tuple, List
+from types import MappingProxyType
+from typing import Dict, Any, Optional, Tuple, List, NamedTuple
+
+from common.logging_config import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# Logging is configured by the first MetadataStore rather than at import time,
+# so importing this module leaves the logging configuration untouched
+_LOGGING_CONFIGURED = False
 
 # Import schema version for migrations from manifest.toml
 try:
@@ -26,7 +38,350 @@ except ImportError:
     METADATA_SCHEMA_VERSION = "1.0"  # Fallback if import fails
     logger.error("TOML utilities not available. Metric definitions cannot be loaded. Please ensure common/toml_utils.py exists and get_expanded_metrics is available.")
 
-logger = logging.getLogger(__name__)
+# Maximum number of bound parameters used in a single batched statement.
+# Kept well below SQLITE_MAX_VARIABLE_NUMBER (999 on older SQLite builds).
+SQLITE_MAX_BATCH_PARAMS = 500
+
+# PRAGMAs applied to every connection. synchronous=NORMAL is safe with WAL
+# (a commit may roll back on power loss, but the database cannot corrupt).
+SQLITE_CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",  # 64 MB page cache (negative value = KiB)
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA mmap_size=268435456",  # read pages through a 256 MB memory map
+    "PRAGMA wal_autocheckpoint=200",  # checkpoint every 200 pages instead of 1000
+    "PRAGMA journal_size_limit=6144000",  # shrink the -wal file back to ~6 MB after checkpoints
+)
+
+# Size of each connection's prepared statement cache (sqlite3 defaults to
+# 128). Statements are looked up by their SQL text, so the hot-path SQL below
+# is kept as fixed module-level strings.
+SQLITE_CACHED_STATEMENTS = 256
+
+# Minimum seconds between explicit WAL checkpoints, which truncate the -wal
+# file after bursts of writes
+WAL_CHECKPOINT_INTERVAL = 60
+
+# str.title() capitalizes every letter that follows a non-letter, while
+# per-word capitalize() only touches the first character of each word. For
+# ASCII names the two agree unless a letter follows a digit or punctuation.
+_TITLE_MISMATCH_RE = re.compile(r'[^a-zA-Z\s][a-zA-Z]')
+_CPU_WORD_RE = re.compile(r'(?<!\S)Cpu(?!\S)')
+# Separators that _format_metric_name turns into spaces, mapped in one pass
+_NAME_SEPARATOR_TABLE = str.maketrans('_.', '  ')
+# Words displayed in a fixed form instead of capitalized, keyed on lowercase
+_NAME_WORD_OVERRIDES = {'cpu': 'CPU'}
+
+# Seconds a format rules result is served from memory before the
+# format_rules table is read again
+FORMAT_RULES_CACHE_TTL = 60
+
+# Seconds a cached get_or_create_service/get_or_create_metric result is
+# returned without touching the database. Once it expires the next call
+# goes back to SQLite, which also refreshes the row's last_seen.
+LOOKUP_CACHE_REFRESH_INTERVAL = 300
+
+# last_seen refreshes for cache hits are buffered and written in one
+# transaction once this many rows are pending or this many seconds passed
+LAST_SEEN_FLUSH_SIZE = 256
+LAST_SEEN_FLUSH_INTERVAL = 60
+
+_LAST_SEEN_UPDATES = {
+    'services': "UPDATE services SET last_seen = ? WHERE id = ?",
+    'metrics': "UPDATE metrics SET last_seen = ? WHERE id = ?",
+}
+
+# INSERT ... ON CONFLICT DO UPDATE needs SQLite 3.24. Older libraries use a
+# SELECT followed by an UPDATE or INSERT instead.
+SQLITE_HAS_UPSERT = sqlite3.sqlite_version_info >= (3, 24, 0)
+
+# UPSERT ... RETURNING needs SQLite 3.35. Older libraries run the same UPSERT
+# and read the row back with a SELECT on its unique key.
+SQLITE_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+def _returning(sql: str, columns: str) -> str:
+    """Append a RETURNING clause to an UPSERT when SQLite supports it."""
+    return f"{sql.rstrip()}\n    RETURNING {columns}\n" if SQLITE_HAS_RETURNING else sql
+
+# Insert a host/namespace/service or refresh the existing row, returning its ID
+_UPSERT_HOST_SQL = _returning("""
+    INSERT INTO hosts 
+    (id, hostname, first_seen, last_seen)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(hostname) DO UPDATE SET last_seen = excluded.last_seen
+""", "id")
+_UPSERT_SERVICE_NAMESPACE_SQL = _returning("""
+    INSERT INTO service_namespaces 
+    (id, namespace, first_seen, last_seen)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(namespace) DO UPDATE SET last_seen = excluded.last_seen
+""", "id")
+# Empty version/description keep the stored values
+_UPSERT_SERVICE_SQL = _returning("""
+    INSERT INTO services 
+    (id, full_name, display_name, version, description, host_id, namespace_id, first_seen, last_seen)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(full_name) DO UPDATE SET
+        display_name = excluded.display_name,
+        version = COALESCE(NULLIF(excluded.version, ''), version),
+        description = COALESCE(NULLIF(excluded.description, ''), description),
+        host_id = excluded.host_id,
+        namespace_id = excluded.namespace_id,
+        last_seen = excluded.last_seen
+""", "id")
+
+# Legacy equivalents of the upserts above for SQLite older than 3.24; the
+# UPDATE statements take the values to refresh followed by the row ID
+_INSERT_HOST_SQL = "INSERT INTO hosts (id, hostname, first_seen, last_seen) VALUES (?, ?, ?, ?)"
+_UPDATE_HOST_SQL = "UPDATE hosts SET last_seen = ? WHERE id = ?"
+_INSERT_SERVICE_NAMESPACE_SQL = "INSERT INTO service_namespaces (id, namespace, first_seen, last_seen) VALUES (?, ?, ?, ?)"
+_UPDATE_SERVICE_NAMESPACE_SQL = "UPDATE service_namespaces SET last_seen = ? WHERE id = ?"
+_INSERT_SERVICE_SQL = """
+    INSERT INTO services 
+    (id, full_name, display_name, version, description, host_id, namespace_id, first_seen, last_seen)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+_UPDATE_SERVICE_SQL = """
+    UPDATE services SET
+        display_name = ?,
+        version = COALESCE(NULLIF(?, ''), version),
+        description = COALESCE(NULLIF(?, ''), description),
+        host_id = ?,
+        namespace_id = ?,
+        last_seen = ?
+    WHERE id = ?
+"""
+
+# Read back an upserted row when RETURNING is not available
+_SELECT_HOST_ID_SQL = "SELECT id FROM hosts WHERE hostname = ?"
+_SELECT_SERVICE_NAMESPACE_ID_SQL = "SELECT id FROM service_namespaces WHERE namespace = ?"
+_SELECT_SERVICE_ID_SQL = "SELECT id FROM services WHERE full_name = ?"
+_SELECT_METRIC_ID_SQL = "SELECT id, display_name FROM metrics WHERE service_id = ? AND name = ?"
+
+# Reads the IDs and display names of all metrics of a service
+_SELECT_SERVICE_METRIC_IDS_SQL = "SELECT name, id, display_name FROM metrics WHERE service_id = ?"
+
+# Secondary indexes created on every schema version, as (name, statement).
+# Lookups by full_name, hostname and namespace are served by the UNIQUE
+# constraints on those columns. The metrics index also carries id and
+# display_name so per-service ID lookups are answered from the index alone.
+SECONDARY_INDEXES = (
+    ("idx_format_rules_priority",
+     "CREATE INDEX IF NOT EXISTS idx_format_rules_priority ON format_rules(priority DESC)"),
+    ("idx_metrics_service_name_display",
+     "CREATE INDEX IF NOT EXISTS idx_metrics_service_name_display "
+     "ON metrics(service_id, name, display_name, id)"),
+)
+
+# Seeded into format_rules when the schema is created, and returned by
+# get_format_rules when the database cannot be read. Read-only, so every
+# use works on its own dict copies.
+_DEFAULT_FORMAT_RULES = (
+    MappingProxyType({'pattern': 'cpu', 'replacement': 'CPU', 'rule_type': 'word_replacement', 'priority': 100}),
+    MappingProxyType({'pattern': '_', 'replacement': ' ', 'rule_type': 'character_replacement', 'priority': 50}),
+    MappingProxyType({'pattern': 'word_start', 'replacement': 'capitalize', 'rule_type': 'word_formatting', 'priority': 10}),
+)
+
+def _default_format_rules() -> List[Dict[str, Any]]:
+    """Return fresh, modifiable copies of the default format rules."""
+    return [dict(rule) for rule in _DEFAULT_FORMAT_RULES]
+
+# Runs of characters outside [a-z0-9], collapsed to one underscore by
+# sanitize_for_metrics. Compiled once since sanitization runs per metric.
+_NON_IDENTIFIER_RUN_RE = re.compile(r'[^a-z0-9]+')
+
+# format_type for a TOML metric, indexed by (is_counter << 1) | is_percentage.
+# Counters take precedence over percentages.
+_FORMAT_TYPES = ("number", "percentage", "counter", "counter")
+
+class MetricRow(NamedTuple):
+    """A metric of a service as returned by get_metrics_for_service and get_metric_info."""
+    id: str
+    name: str
+    display_name: str
+    unit: str
+    format_type: str
+    decimal_places: int
+    is_percentage: bool
+
+# Metric and service names form a small, stable set that is formatted on every
+# collection cycle, so the pure name helpers below are memoized. They are
+# module-level functions so that the caches are not keyed on MetadataStore
+# instances.
+NAME_CACHE_SIZE = 2048
+
+@lru_cache(maxsize=NAME_CACHE_SIZE)
+def _sanitize_for_metrics(input_string: str) -> str:
+    """Cached implementation of MetadataStore.sanitize_for_metrics."""
+    if not input_string:
+        return 'unknown'
+        
+    # 1. Convert to lowercase
+    result = input_string.lower()
+    
+    # 2. Replace each run of invalid characters and/or underscores with
+    #    a single underscore (one regex pass)
+    result = _NON_IDENTIFIER_RUN_RE.sub('_', result)
+    
+    # 3. Remove leading/trailing underscores
+    result = result.strip('_')
+    
+    # 4. Ensure it starts with a letter (prefix if needed)
+    if result and not result[0].isalpha():
+        result = 'metric_' + result
+    
+    # 5. Handle empty result
+    return result or 'unknown'
+
+@lru_cache(maxsize=NAME_CACHE_SIZE)
+def _format_metric_name(name: str) -> str:
+    """Cached implementation of MetadataStore._format_metric_name."""
+    # Handle parameterized metrics
+    if '{' in name and '}' in name:
+        # For names like 'cpu_core_{index}', format the base name
+        base_name = name.split('{')[0].strip('_')
+        parameter = name[name.find('{'):]
+        return f"{_format_metric_name(base_name)} {parameter}"
+        
+    # General formatting rules
+    display_name = name.translate(_NAME_SEPARATOR_TABLE)
+    
+    # Fast path: capitalize all words in one C-level pass, then restore CPU
+    # (the regex only runs for the names that contain it)
+    if display_name.isascii() and not _TITLE_MISMATCH_RE.search(display_name):
+        formatted = ' '.join(display_name.title().split())
+        return _CPU_WORD_RE.sub('CPU', formatted) if 'Cpu' in formatted else formatted
+    
+    # Capitalize words, handling acronyms like CPU
+    return ' '.join(
+        _NAME_WORD_OVERRIDES.get(word.lower()) or word.capitalize()
+        for word in display_name.split()
+    )
+
+@lru_cache(maxsize=NAME_CACHE_SIZE)
+def _service_display_name(full_name: str) -> str:
+    """Cached implementation of MetadataStore._extract_service_display_name."""
+    # Format the part after the last dot
+    return _format_metric_name(full_name.rpartition('.')[2])
+
+@lru_cache(maxsize=NAME_CACHE_SIZE)
+def _simple_metric_name(full_metric_name: str) -> str:
+    """Cached implementation of MetadataStore.get_simple_metric_name."""
+    if not full_metric_name:
+        return "unknown"
+        
+    # For parameterized metrics, return the name as is
+    if '{' in full_metric_name and '}' in full_metric_name:
+        return full_metric_name
+        
+    # For other metrics, sanitize to ensure compliance
+    return _sanitize_for_metrics(full_metric_name)
+
+# (epoch second, ISO string) of the last timestamp produced. Replaced as a
+# whole so concurrent readers always see a matching pair.
+_timestamp_cache = (0, '')
+
+def _legacy_upsert(
+    cursor: sqlite3.Cursor,
+    select_sql: str,
+    key: tuple,
+    insert_sql: str,
+    insert_params: tuple,
+    update_sql: str,
+    update_params: tuple
+) -> str:
+    """
+    Insert a row or update the existing one without ON CONFLICT DO UPDATE.
+    
+    Used on SQLite older than 3.24. Does not commit.
+    
+    Args:
+        cursor: Cursor of the connection running the transaction
+        select_sql: Query returning the ID of the row with the given key
+        key: Parameters of select_sql
+        insert_sql: Statement inserting a new row
+        insert_params: Parameters of insert_sql, starting with the new ID
+        update_sql: Statement refreshing a row, with the row ID as last parameter
+        update_params: Parameters of update_sql, without the row ID
+        
+    Returns:
+        ID of the inserted or updated row
+    """
+    cursor.execute(select_sql, key)
+    result = cursor.fetchone()
+    if result is None:
+        cursor.execute(insert_sql, insert_params)
+        return insert_params[0]
+    cursor.execute(update_sql, (*update_params, result[0]))
+    return result[0]
+
+def _format_timestamp(seconds: float) -> str:
+    """Format an epoch time as the local ISO timestamp stored in the database."""
+    return datetime.fromtimestamp(int(seconds)).isoformat()
+
+def _current_timestamp() -> str:
+    """
+    Timestamp used for first_seen/last_seen columns.
+    
+    Second resolution is all these columns need, so the formatted string is
+    reused until the clock moves to the next second.
+    """
+    global _timestamp_cache
+    now = int(time.time())
+    cached_second, cached_text = _timestamp_cache
+    if cached_second == now:
+        return cached_text
+    text = _format_timestamp(now)
+    _timestamp_cache = (now, text)
+    return text
+
+# Value formatters keyed on (is_percentage, is_counter, decimal_places). Only a
+# handful of distinct combinations exist, so every metric shares one of them.
+_formatters = {}
+
+def _make_formatter(is_percentage: bool, is_counter: bool, decimal_places: int):
+    """
+    Return a one-argument function that formats raw values for a metric.
+
+    The percentage/counter decisions are made once here rather than on every
+    value; see MetadataStore.format_metric_value for the formatting rules.
+    """
+    key = (bool(is_percentage), bool(is_counter), decimal_places)
+    formatter = _formatters.get(key)
+    if formatter is None:
+        if is_counter and is_percentage:
+            formatter = lambda value: int(round(value * 100.0 if value <= 1.0 else value))
+        elif is_counter:
+            formatter = lambda value: int(round(value))
+        elif is_percentage:
+            formatter = lambda value: round(value * 100.0 if value <= 1.0 else value, decimal_places)
+        else:
+            formatter = lambda value: round(value, decimal_places)
+        formatter = _formatters.setdefault(key, formatter)
+    return formatter
+
+def _new_row_id() -> str:
+    """
+    Generate the ID of a new metrics or service_namespaces row.
+    
+    These IDs never leave the database, so they use the 32-character hex
+    form of a UUID; the dashes of the canonical form only add bytes to every
+    row and index entry. Host and service IDs keep the canonical form
+    because they are exported as OpenTelemetry resource attributes.
+    """
+    return uuid.uuid4().hex
+
+# Stores whose connections must be closed at interpreter exit. Weak references
+# keep the registry from extending the lifetime of any store.
+_open_stores = weakref.WeakSet()
+
+def _close_open_stores():
+    """Close the connections of every MetadataStore still alive at exit."""
+    for store in list(_open_stores):
+        store.close()
+
+atexit.register(_close_open_stores)
 
 class MetadataStore:
     """
@@ -42,7 +397,8 @@ class MetadataStore:
         Build a parametrized SQL query for metrics table operations.
         
         Args:
-            operation_type: Either 'insert' or 'update'
+            operation_type: One of 'insert', 'update', 'upsert' or
+                'bulk_upsert' (an upsert without RETURNING, for executemany)
             include_otel_type: Whether to include otel_type column
             
         Returns:
@@ -88,13 +444,34 @@ class MetadataStore:
             param_order.append("id")  # For WHERE clause
             
             sql = f"""
-            UPDATE metrics 
+            UPDATE metrics
             SET {', '.join(set_clauses)}
             WHERE id = ?
             """
-            
+
             return sql, param_order
-    
+
+        elif operation_type in ('upsert', 'bulk_upsert'):
+            # Insert the metric, or refresh the existing (service_id, name) row
+            # in the same statement; uses the insert parameter order
+            insert_sql, param_order = self._build_metrics_query('insert', include_otel_type)
+
+            update_columns = ["display_name", "unit", "format_type",
+                              "decimal_places", "is_percentage"]
+            if include_otel_type:
+                update_columns.append("otel_type")
+            update_columns.append("last_seen")
+            set_clauses = [f"{column} = excluded.{column}" for column in update_columns]
+
+            sql = f"""{insert_sql.rstrip()}
+            ON CONFLICT(service_id, name) DO UPDATE
+            SET {', '.join(set_clauses)}
+            """
+            if operation_type == 'upsert':
+                sql = _returning(sql, "id, display_name")
+
+            return sql, param_order
+
     def sanitize_for_metrics(self, input_string: str) -> str:
         """
         Convert any string to a safe technical identifier using only [a-z0-9_].
@@ -108,28 +485,8 @@ class MetadataStore:
         Returns:
             Sanitized string safe for technical use
         """
-        if not input_string:
-            return 'unknown'
-            
-        # 1. Convert to lowercase
-        result = input_string.lower()
-        
-        # 2. Replace invalid characters with underscore
-        result = re.sub(r'[^a-z0-9_]', '_', result)
-        
-        # 3. Collapse multiple underscores into a single underscore
-        result = re.sub(r'_+', '_', result)
-        
-        # 4. Remove leading/trailing underscores
-        result = result.strip('_')
-        
-        # 5. Ensure it starts with a letter (prefix if needed)
-        if result and not result[0].isalpha():
-            result = 'metric_' + result
-        
-        # 6. Handle empty result
-        return result or 'unknown'
-    
+        return _sanitize_for_metrics(input_string)
+
     def __init__(self, db_path: Optional[str] = None):
         """
         Initialize the metadata store.
@@ -137,6 +494,11 @@ class MetadataStore:
         Args:
             db_path: Path to the SQLite database file. If None, uses default location.
         """
+        global _LOGGING_CONFIGURED
+        if not _LOGGING_CONFIGURED:
+            setup_logging()
+            _LOGGING_CONFIGURED = True
+        
         if db_path is None:
             # Create db in a .instana_plugins directory in the user's home
             home_dir = os.path.expanduser("~")
@@ -158,8 +520,40 @@ class MetadataStore:
         self.db_path = db_path
         logger.info(f"Using metadata database at: {self.db_path}")
         
-        # Initialize schema cache
-        self.metrics_columns = None
+        # Pending last_seen refreshes, keyed on (table, row id)
+        self._pending_touches = {}
+        self._pending_touches_lock = threading.Lock()
+        self._last_touch_flush = time.time()
+        # Writes pending refreshes if no later touch triggers a flush
+        self._flush_timer = None
+        
+        # IDs handed out while the database could not be written, so that
+        # repeated calls during an outage keep returning the same ID
+        self._fallback_service_ids = {}
+        self._fallback_metric_ids = {}
+        
+        # Counters reported by stats()
+        self._stats = {
+            'lookup_cache_hits': 0,
+            'lookup_cache_misses': 0,
+            'db_upserts': 0,
+            'db_upsert_seconds': 0.0,
+            'last_seen_flushes': 0,
+        }
+        self._last_wal_checkpoint = time.monotonic()
+        
+        # One long-lived connection per thread keeps SQLite's page and
+        # statement caches warm between calls. Connections are tracked by
+        # their owning thread so those of finished threads can be closed.
+        self._local = threading.local()
+        self._connections = {}
+        self._connections_lock = threading.Lock()
+        _open_stores.add(self)
+        
+        # Initialize schema, format rules and lookup caches
+        self._set_metrics_columns(None)
+        self._invalidate_format_rules_cache()
+        self._clear_lookup_caches()
         
         # Initialize the database schema
         self._init_db()
@@ -198,6 +592,12 @@ class MetadataStore:
                 logger.info("No schema detected. Creating version 2.0")
                 self._create_schema_version_2_0()
                 
+            # Add indexes missing from databases created by older releases
+            self._create_secondary_indexes()
+            
+            # Switch the database to write-ahead logging (persistent per file)
+            self._enable_wal_mode()
+            
             logger.debug("Database schema initialized successfully")
             
         except sqlite3.Error as e:
@@ -235,7 +635,10 @@ class MetadataStore:
         """Drop the existing database file to remove legacy schema."""
         try:
             if self.db_path != ":memory:" and os.path.exists(self.db_path):
+                # Release open handles before removing the file
+                self.close()
                 os.remove(self.db_path)
+                self._clear_lookup_caches()
                 logger.info("Legacy database file removed")
         except OSError as e:
             logger.error(f"Error removing database file: {e}")
@@ -249,6 +652,10 @@ class MetadataStore:
             with self._get_db_connection() as conn:
                 cursor = conn.cursor()
                 
+                # sqlite3 does not open implicit transactions for DDL; create
+                # all tables and seed rows in one transaction and one commit
+                cursor.execute("BEGIN")
+                
                 # Create hosts table
                 cursor.execute("""
                 CREATE TABLE hosts (
@@ -318,20 +725,12 @@ class MetadataStore:
                 """)
                 
                 # Add default format rules
-                default_rules = [
-                    ("cpu", "CPU", "word_replacement", 100),
-                    ("_", " ", "character_replacement", 50),
-                    ("word_start", "capitalize", "word_formatting", 10)
-                ]
-                
-                for pattern, replacement, rule_type, priority in default_rules:
-                    cursor.execute("""
-                    INSERT INTO format_rules
-                    (pattern, replacement, rule_type, priority)
-                    VALUES (?, ?, ?, ?)
-                    """, (pattern, replacement, rule_type, priority))
-                
-                conn.commit()
+                cursor.executemany("""
+                INSERT INTO format_rules
+                (pattern, replacement, rule_type, priority)
+                VALUES (:pattern, :replacement, :rule_type, :priority)
+                """, _default_format_rules())
+            self._invalidate_format_rules_cache()
             
             # Set schema version to 2.0
             self._set_schema_version("2.0")
@@ -369,12 +768,14 @@ class MetadataStore:
                 logger.warning("Legacy metadata database detected. Previous metadata will be deleted and recreated for schema v1.0")
                 
                 # Delete the old database file
+                self.close()
                 os.remove(self.db_path)
                 logger.info("Legacy metadata database deleted")
             
             # Create fresh database with v1.0 schema
             with self._get_db_connection() as conn:
                 cursor = conn.cursor()
+                cursor.execute("BEGIN")
                 
                 # Create hosts table
                 cursor.execute("""
@@ -444,20 +845,12 @@ class MetadataStore:
                 """)
                 
                 # Add default format rules
-                default_rules = [
-                    ("cpu", "CPU", "word_replacement", 100),
-                    ("_", " ", "character_replacement", 50),
-                    ("word_start", "capitalize", "word_formatting", 10)
-                ]
-                
-                for pattern, replacement, rule_type, priority in default_rules:
-                    cursor.execute("""
-                    INSERT INTO format_rules
-                    (pattern, replacement, rule_type, priority)
-                    VALUES (?, ?, ?, ?)
-                    """, (pattern, replacement, rule_type, priority))
-                
-                conn.commit()
+                cursor.executemany("""
+                INSERT INTO format_rules
+                (pattern, replacement, rule_type, priority)
+                VALUES (:pattern, :replacement, :rule_type, :priority)
+                """, _default_format_rules())
+            self._invalidate_format_rules_cache()
             
             # Set schema version
             self._set_schema_version("1.0")
@@ -481,7 +874,7 @@ class MetadataStore:
                 
                 # Check if otel_type column already exists
                 cursor.execute("PRAGMA table_info(metrics)")
-                columns = [column[1] for column in cursor.fetchall()]
+                columns = [column['name'] for column in cursor.fetchall()]
                 
                 if 'otel_type' not in columns:
                     # Add otel_type column with default value
@@ -511,8 +904,6 @@ class MetadataStore:
                     logger.info(f"Migration statistics: {migration_stats}")
                 else:
                     logger.info("otel_type column already exists, skipping schema modification")
-                
-                conn.commit()
             
             # Set schema version
             self._set_schema_version("2.0")
@@ -584,8 +975,7 @@ class MetadataStore:
                     VALUES (?, ?, ?)
                 """, (version, now, now))
                 
-                conn.commit()
-                logger.info(f"Set schema version to: {version}")
+            logger.info(f"Set schema version to: {version}")
                 
         except sqlite3.Error as e:
             logger.error(f"Error setting schema version: {e}")
@@ -631,17 +1021,158 @@ class MetadataStore:
     # DATABASE CONNECTION MANAGEMENT
     # ================================
     
+    @contextmanager
     def _get_db_connection(self):
         """
         Context manager for database connections.
         
         Provides consistent connection handling with automatic cleanup
-        and proper exception handling.
+        and proper exception handling. The calling thread's long-lived
+        connection is reused; pending changes are committed when the block
+        exits normally and rolled back if it raises.
+        
+        Yields:
+            sqlite3.Connection: Configured database connection
+        """
+        conn = self._get_thread_connection()
+        with conn:
+            yield conn
+    
+    @contextmanager
+    def _write_transaction(self):
+        """
+        Context manager for a transaction that takes the write lock up front.
+        
+        A deferred transaction that reads before it writes has to upgrade its
+        lock, which fails with SQLITE_BUSY without waiting when another
+        connection wrote in between. BEGIN IMMEDIATE waits for the write lock
+        (up to busy_timeout) before the first statement instead.
+        
+        Yields:
+            sqlite3.Connection: Configured database connection
+        """
+        with self._get_db_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+    
+    def _get_thread_connection(self):
+        """
+        Get the calling thread's connection, opening it on first use.
         
         Returns:
-            sqlite3.Connection: Database connection context manager
+            sqlite3.Connection: Configured database connection
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Each connection is only used by the thread that opened it;
+            # check_same_thread=False lets close() run from any thread
+            conn = sqlite3.connect(
+                self.db_path, check_same_thread=False, cached_statements=SQLITE_CACHED_STATEMENTS
+            )
+            try:
+                self._configure_connection(conn)
+            except sqlite3.Error:
+                conn.close()
+                raise
+            self._local.conn = conn
+            with self._connections_lock:
+                stale = self._release_finished_threads()
+                self._connections[threading.current_thread()] = conn
+            self._close_connections(stale)
+        return conn
+    
+    def _release_finished_threads(self):
+        """
+        Remove the connections of threads that have exited from the registry.
+        
+        Must be called with _connections_lock held.
+        
+        Returns:
+            List of connections the caller should close
+        """
+        finished = [thread for thread in self._connections if not thread.is_alive()]
+        return [self._connections.pop(thread) for thread in finished]
+    
+    def _close_connections(self, connections):
+        """Close connections, logging rather than raising on failure."""
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                logger.warning(f"Error closing metadata database connection: {e}")
+    
+    def close(self):
+        """
+        Flush pending last_seen updates and close every connection opened
+        by this store.
+        
+        The store remains usable; the next call opens a fresh connection.
+        """
+        self._flush_last_seen()
+        
+        with self._connections_lock:
+            connections, self._connections = self._connections, {}
+            self._local = threading.local()
+            
+        self._close_connections(connections.values())
+
+    def __del__(self):
+        # sqlite3 connections sit in a reference cycle (their statement cache),
+        # so close them explicitly instead of waiting for the cyclic collector.
+        # Only close here: writing during garbage collection or interpreter
+        # teardown is unsafe, and the atexit hook already flushes live stores.
+        connections = getattr(self, '_connections', None)
+        if connections:
+            self._close_connections(list(connections.values()))
+
+    def _configure_connection(self, conn):
+        """
+        Apply the per-connection settings used by every metadata store connection.
+        
+        Rows are returned as sqlite3.Row, which supports both index and
+        column-name access, so getters can build dicts directly from rows.
+        
+        Args:
+            conn: Newly opened SQLite connection
+        """
+        conn.row_factory = sqlite3.Row
+        for pragma in SQLITE_CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+    
+    def _create_secondary_indexes(self):
         """
-        return sqlite3.connect(self.db_path)
+        Create any secondary index that does not exist yet.
+        
+        Statistics are gathered with ANALYZE whenever an index was added, so
+        the query planner can weigh it against the UNIQUE constraint indexes.
+        """
+        with self._get_db_connection() as conn:
+            existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+            missing = [statement for name, statement in SECONDARY_INDEXES if name not in existing]
+            for statement in missing:
+                conn.execute(statement)
+            if missing:
+                conn.execute("ANALYZE")
+    
+    def _enable_wal_mode(self):
+        """
+        Enable write-ahead logging for the metadata database.
+        
+        WAL turns each commit into a sequential append and lets readers run
+        concurrently with a writer. The journal mode is stored in the database
+        file, so this only needs to run once at initialization. In-memory
+        databases do not support WAL and are left unchanged.
+        """
+        if self.db_path == ":memory:":
+            return
+            
+        with self._get_db_connection() as conn:
+            journal_mode = conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+            
+        if journal_mode.lower() != "wal":
+            logger.warning(f"Could not enable WAL mode for metadata database, using journal mode: {journal_mode}")
+        else:
+            logger.debug("Metadata database is using WAL journal mode")
     
     def _cache_metrics_schema(self):
         """
@@ -654,15 +1185,46 @@ class MetadataStore:
                 
                 # Get metrics table schema once and cache it
                 cursor.execute("PRAGMA table_info(metrics)")
-                columns = [column[1] for column in cursor.fetchall()]
-                self.metrics_columns = set(columns)
+                columns = [column['name'] for column in cursor.fetchall()]
+                self._set_metrics_columns(set(columns))
                 
             logger.debug(f"Cached metrics table schema: {len(self.metrics_columns)} columns")
             
         except sqlite3.Error as e:
             logger.error(f"Error caching metrics schema: {e}")
             # Fall back to None, which will trigger the old behavior
-            self.metrics_columns = None
+            self._set_metrics_columns(None)
+    
+    def _set_metrics_columns(self, columns: Optional[set]):
+        """
+        Update the cached metrics schema and everything derived from it.
+        
+        Whether otel_type is present and the matching upsert and
+        get_service_metrics statements only change with the schema, so they
+        are computed here rather than per call.
+        
+        Args:
+            columns: Set of metrics table column names, or None if unknown
+        """
+        self.metrics_columns = columns
+        self._include_otel_type = bool(columns and 'otel_type' in columns)
+        self._upsert_metric_sql, _ = self._build_metrics_query('upsert', self._include_otel_type)
+        self._bulk_upsert_metric_sql, _ = self._build_metrics_query('bulk_upsert', self._include_otel_type)
+        # Used instead of the upserts when SQLite predates ON CONFLICT DO UPDATE
+        self._insert_metric_sql, self._insert_metric_params = self._build_metrics_query('insert', self._include_otel_type)
+        self._update_metric_sql, self._update_metric_params = self._build_metrics_query('update', self._include_otel_type)
+        
+        # Pre-2.0 schemas have no otel_type column; project a constant
+        # so every row has the same shape either way
+        otel_type_column = "COALESCE(otel_type, 'Gauge')" if self._include_otel_type else "'Gauge'"
+        self._service_metrics_sql = f"""
+            SELECT id, name, display_name, unit, format_type, 
+                   decimal_places, is_percentage, is_counter,
+                   {otel_type_column} AS otel_type,
+                   'Metric for ' || name AS description
+            FROM metrics
+            WHERE service_id = ?
+        """
     
     # ================================
     # CORE CRUD OPERATIONS
@@ -680,48 +1242,47 @@ class MetadataStore:
         """
         try:
             with self._get_db_connection() as conn:
-                cursor = conn.cursor()
-                
-                # Check if host exists
-                cursor.execute(
-                    "SELECT id FROM hosts WHERE hostname = ?",
-                    (hostname,)
-                )
-                result = cursor.fetchone()
-                
-                now = datetime.now().isoformat()
-                
-                if result:
-                    # Host exists, update last_seen
-                    host_id = result[0]
-                    cursor.execute(
-                        "UPDATE hosts SET last_seen = ? WHERE id = ?",
-                        (now, host_id)
-                    )
-                    conn.commit()
-                    logger.debug(f"Using existing host: {hostname} (ID: {host_id})")
-                    
-                else:
-                    # Host doesn't exist, create new
-                    host_id = str(uuid.uuid4())
-                    cursor.execute(
-                        """
-                        INSERT INTO hosts 
-                        (id, hostname, first_seen, last_seen)
-                        VALUES (?, ?, ?, ?)
-                        """,
-                        (host_id, hostname, now, now)
-                    )
-                    conn.commit()
-                    logger.info(f"Created new host: {hostname} (ID: {host_id})")
-                    
-                return host_id
+                return self._upsert_host(conn.cursor(), hostname, _current_timestamp())
             
         except sqlite3.Error as e:
             logger.error(f"Error in get_or_create_host: {e}")
             # Fall back to generating an ID without persistence
             return str(uuid.uuid4())
     
+    def _upsert_host(self, cursor: sqlite3.Cursor, hostname: str, now: str) -> str:
+        """
+        Insert a host or refresh its last_seen, without committing.
+        
+        Args:
+            cursor: Cursor of the connection running the transaction
+            hostname: Hostname of the system
+            now: Timestamp stored in first_seen/last_seen
+            
+        Returns:
+            Host UUID
+        """
+        new_host_id = str(uuid.uuid4())
+        
+        if SQLITE_HAS_UPSERT:
+            # Insert the host or refresh last_seen in a single statement
+            cursor.execute(_UPSERT_HOST_SQL, (new_host_id, hostname, now, now))
+            if not SQLITE_HAS_RETURNING:
+                cursor.execute(_SELECT_HOST_ID_SQL, (hostname,))
+            host_id = cursor.fetchone()[0]
+        else:
+            host_id = _legacy_upsert(
+                cursor, _SELECT_HOST_ID_SQL, (hostname,),
+                _INSERT_HOST_SQL, (new_host_id, hostname, now, now),
+                _UPDATE_HOST_SQL, (now,)
+            )
+        
+        if host_id == new_host_id:
+            logger.info(f"Created new host: {hostname} (ID: {host_id})")
+        else:
+            logger.debug(f"Using existing host: {hostname} (ID: {host_id})")
+            
+        return host_id
+    
     def get_or_create_service_namespace(self, namespace: str) -> str:
         """
         Get existing service namespace ID or create a new one if it doesn't exist.
@@ -734,48 +1295,47 @@ class MetadataStore:
         """
         try:
             with self._get_db_connection() as conn:
-                cursor = conn.cursor()
-                
-                # Check if namespace exists
-                cursor.execute(
-                    "SELECT id FROM service_namespaces WHERE namespace = ?",
-                    (namespace,)
-                )
-                result = cursor.fetchone()
-                
-                now = datetime.now().isoformat()
-                
-                if result:
-                    # Namespace exists, update last_seen
-                    namespace_id = result[0]
-                    cursor.execute(
-                        "UPDATE service_namespaces SET last_seen = ? WHERE id = ?",
-                        (now, namespace_id)
-                    )
-                    conn.commit()
-                    logger.debug(f"Using existing namespace: {namespace} (ID: {namespace_id})")
-                    
-                else:
-                    # Namespace doesn't exist, create new
-                    namespace_id = str(uuid.uuid4())
-                    cursor.execute(
-                        """
-                        INSERT INTO service_namespaces 
-                        (id, namespace, first_seen, last_seen)
-                        VALUES (?, ?, ?, ?)
-                        """,
-                        (namespace_id, namespace, now, now)
-                    )
-                    conn.commit()
-                    logger.info(f"Created new namespace: {namespace} (ID: {namespace_id})")
-                    
-                return namespace_id
+                return self._upsert_service_namespace(conn.cursor(), namespace, _current_timestamp())
             
         except sqlite3.Error as e:
             logger.error(f"Error in get_or_create_service_namespace: {e}")
             # Fall back to generating an ID without persistence
-            return str(uuid.uuid4())
-
+            return _new_row_id()
+    
+    def _upsert_service_namespace(self, cursor: sqlite3.Cursor, namespace: str, now: str) -> str:
+        """
+        Insert a service namespace or refresh its last_seen, without committing.
+        
+        Args:
+            cursor: Cursor of the connection running the transaction
+            namespace: Service namespace (e.g., MicroStrategy)
+            now: Timestamp stored in first_seen/last_seen
+            
+        Returns:
+            Service namespace UUID
+        """
+        new_namespace_id = _new_row_id()
+        
+        if SQLITE_HAS_UPSERT:
+            # Insert the namespace or refresh last_seen in a single statement
+            cursor.execute(_UPSERT_SERVICE_NAMESPACE_SQL, (new_namespace_id, namespace, now, now))
+            if not SQLITE_HAS_RETURNING:
+                cursor.execute(_SELECT_SERVICE_NAMESPACE_ID_SQL, (namespace,))
+            namespace_id = cursor.fetchone()[0]
+        else:
+            namespace_id = _legacy_upsert(
+                cursor, _SELECT_SERVICE_NAMESPACE_ID_SQL, (namespace,),
+                _INSERT_SERVICE_NAMESPACE_SQL, (new_namespace_id, namespace, now, now),
+                _UPDATE_SERVICE_NAMESPACE_SQL, (now,)
+            )
+        
+        if namespace_id == new_namespace_id:
+            logger.info(f"Created new namespace: {namespace} (ID: {namespace_id})")
+        else:
+            logger.debug(f"Using existing namespace: {namespace} (ID: {namespace_id})")
+            
+        return namespace_id
+            
     def get_or_create_service(self, full_name: str, version: str = "", description: str = "", hostname: str = "", service_namespace: str = "") -> Tuple[str, str]:
         """
         Get existing service ID or create a new one if it doesn't exist.
@@ -790,6 +1350,12 @@ class MetadataStore:
         Returns:
             Tuple of (service_id, display_name)
         """
+        cache_key = (full_name, version, description, hostname, service_namespace)
+        cached = self._get_cached_lookup(self._service_cache, cache_key)
+        if cached is not None:
+            self._touch_last_seen('services', cached[0])
+            return cached
+        
         try:
             # Sanitize full name for technical storage
             sanitized_name = self.sanitize_for_metrics(full_name)
@@ -797,81 +1363,53 @@ class MetadataStore:
             # Extract display name from original full name for human readability
             display_name = self._extract_service_display_name(full_name)
             
-            # Get or create host and namespace IDs if provided
-            host_id = None
-            if hostname:
-                host_id = self.get_or_create_host(hostname)
-                
-            namespace_id = None
-            if service_namespace:
-                namespace_id = self.get_or_create_service_namespace(service_namespace)
-            
-            with self._get_db_connection() as conn:
+            started = time.perf_counter()
+            with self._write_transaction() as conn:
                 cursor = conn.cursor()
                 
-                # Check if service exists using sanitized name
-                cursor.execute(
-                    "SELECT id, display_name FROM services WHERE full_name = ?",
-                    (sanitized_name,)
-                )
-                result = cursor.fetchone()
-                
-                now = datetime.now().isoformat()
+                now = _current_timestamp()
                 
-                if result:
-                    # Service exists, update last_seen
-                    service_id, existing_display_name = result
-                    
-                    # Get existing version and description if new ones aren't provided
-                    if not version or not description:
-                        cursor.execute(
-                            "SELECT version, description FROM services WHERE id = ?",
-                            (service_id,)
-                        )
-                        existing_values = cursor.fetchone()
-                        if existing_values:
-                            existing_version, existing_description = existing_values
-                            # Use existing values if new ones aren't provided
-                            if not version:
-                                version = existing_version
-                            if not description:
-                                description = existing_description
-                    
-                    # Update service information
-                    cursor.execute(
-                        """
-                        UPDATE services 
-                        SET display_name = ?, version = ?, description = ?, host_id = ?, namespace_id = ?, last_seen = ? 
-                        WHERE id = ?
-                        """,
-                        (display_name, version, description, host_id, namespace_id, now, service_id)
-                    )
-                    
-                    conn.commit()
-                    logger.debug(f"Using existing service: {full_name} (ID: {service_id})")
+                # Resolve host and namespace IDs in the same transaction as
+                # the service itself
+                host_id = None
+                if hostname:
+                    host_id = self._upsert_host(cursor, hostname, now)
                     
+                namespace_id = None
+                if service_namespace:
+                    namespace_id = self._upsert_service_namespace(cursor, service_namespace, now)
+                
+                new_service_id = str(uuid.uuid4())
+                
+                # Insert the service or update the existing row in a single
+                # statement; empty version/description keep the stored values
+                insert_params = (new_service_id, sanitized_name, display_name, version, description,
+                                 host_id, namespace_id, now, now)
+                if SQLITE_HAS_UPSERT:
+                    cursor.execute(_UPSERT_SERVICE_SQL, insert_params)
+                    if not SQLITE_HAS_RETURNING:
+                        cursor.execute(_SELECT_SERVICE_ID_SQL, (sanitized_name,))
+                    service_id = cursor.fetchone()[0]
                 else:
-                    # Service doesn't exist, create new
-                    service_id = str(uuid.uuid4())
-                    cursor.execute(
-                        """
-                        INSERT INTO services 
-                        (id, full_name, display_name, version, description, host_id, namespace_id, first_seen, last_seen)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        """,
-                        (service_id, sanitized_name, display_name, version, description, host_id, namespace_id, now, now)
+                    service_id = _legacy_upsert(
+                        cursor, _SELECT_SERVICE_ID_SQL, (sanitized_name,),
+                        _INSERT_SERVICE_SQL, insert_params,
+                        _UPDATE_SERVICE_SQL, (display_name, version, description, host_id, namespace_id, now)
                     )
-                    conn.commit()
+                
+                if service_id == new_service_id:
                     logger.info(f"Created new service: {full_name} → {sanitized_name} (ID: {service_id})")
+                else:
+                    logger.debug(f"Using existing service: {full_name} (ID: {service_id})")
                     
-                return service_id, display_name
+            self._record_upsert(started)
+            self._service_cache[cache_key] = (service_id, display_name, time.monotonic())
+            return service_id, display_name
             
         except sqlite3.Error as e:
             logger.error(f"Error in get_or_create_service: {e}")
-            # Fall back to generating an ID without persistence
-            service_id = str(uuid.uuid4())
-            display_name = self._extract_service_display_name(full_name)
-            return service_id, display_name
+            # Fall back to an ID without persistence
+            return self._fallback_service(full_name)
             
     def get_or_create_metric(
         self,
@@ -900,107 +1438,154 @@ class MetadataStore:
         Returns:
             Tuple of (metric_id, display_name)
         """
+        cache_key = (service_id, name, unit, format_type, decimal_places,
+                     is_percentage, is_counter, otel_type)
+        cached = self._get_cached_lookup(self._metric_cache, cache_key)
+        if cached is not None:
+            self._touch_last_seen('metrics', cached[0])
+            return cached
+        
+        # Computed before the write so no work is done while holding the lock
+        now = _current_timestamp()
         try:
+            started = time.perf_counter()
             with self._get_db_connection() as conn:
                 cursor = conn.cursor()
                 
-                # Format display name
-                display_name = self._format_metric_name(name)
-                
-                # Check if metric exists
-                cursor.execute(
-                    "SELECT id, display_name FROM metrics WHERE service_id = ? AND name = ?",
-                    (service_id, name)
+                metric_id, display_name = self._upsert_metric(
+                    cursor, service_id, name, unit, format_type, decimal_places,
+                    is_percentage, is_counter, otel_type, now
                 )
-                result = cursor.fetchone()
-                
-                now = datetime.now().isoformat()
-                
-                # Determine if otel_type should be included based on schema
-                include_otel_type = self.metrics_columns and 'otel_type' in self.metrics_columns
-                
-                if result:
-                    # Metric exists, update last_seen and other fields
-                    metric_id, existing_display_name = result
-                    
-                    # Build the appropriate SQL update query
-                    sql, param_order = self._build_metrics_query('update', include_otel_type)
-                    
-                    # Prepare parameters dictionary
-                    params = {
-                        'display_name': display_name,
-                        'unit': unit,
-                        'format_type': format_type,
-                        'decimal_places': decimal_places,
-                        'is_percentage': is_percentage,
-                        'otel_type': otel_type,
-                        'last_seen': now,
-                        'id': metric_id
-                    }
-                    
-                    # Extract parameters in the correct order
-                    param_values = [params[param] for param in param_order]
-                    
-                    # Execute the query
-                    cursor.execute(sql, param_values)
-                    
-                    # Log appropriate message based on schema
-                    if not include_otel_type:
-                        if self.metrics_columns is None:
-                            logger.warning("Metrics schema cache is not available, falling back to legacy update pattern")
-                        elif 'otel_type' not in self.metrics_columns:
-                            logger.debug(f"Schema inconsistency detected: 'otel_type' column not found in cached schema. Available columns: {sorted(self.metrics_columns)}")
-                    
-                    conn.commit()
-                    logger.debug(f"Using existing metric: {name} (ID: {metric_id})")
-                    
-                else:
-                    # Metric doesn't exist, create new
-                    metric_id = str(uuid.uuid4())
-                    
-                    # Build the appropriate SQL insert query
-                    sql, param_order = self._build_metrics_query('insert', include_otel_type)
-                    
-                    # Prepare parameters dictionary
-                    params = {
-                        'id': metric_id,
-                        'service_id': service_id,
-                        'name': name,
-                        'display_name': display_name,
-                        'unit': unit,
-                        'format_type': format_type,
-                        'decimal_places': decimal_places,
-                        'is_percentage': is_percentage,
-                        'is_counter': is_counter,
-                        'otel_type': otel_type,
-                        'first_seen': now,
-                        'last_seen': now
-                    }
-                    
-                    # Extract parameters in the correct order
-                    param_values = [params[param] for param in param_order]
-                    
-                    # Execute the query
-                    cursor.execute(sql, param_values)
-                    
-                    # Log appropriate message based on schema
-                    if not include_otel_type:
-                        if self.metrics_columns is None:
-                            logger.warning("Metrics schema cache is not available, falling back to legacy insert pattern")
-                        elif 'otel_type' not in self.metrics_columns:
-                            logger.debug(f"Schema inconsistency detected: 'otel_type' column not found in cached schema. Available columns: {sorted(self.metrics_columns)}")
-                    
-                    conn.commit()
-                    logger.info(f"Created new metric: {name} (ID: {metric_id}, Type: {otel_type})")
-                    
-                return metric_id, display_name
+            
+            self._record_upsert(started)
+            self._metric_cache[cache_key] = (metric_id, display_name, time.monotonic())
+            return metric_id, display_name
             
         except sqlite3.Error as e:
             logger.error(f"Error in get_or_create_metric: {e}")
-            # Fall back to generating an ID without persistence
-            metric_id = str(uuid.uuid4())
-            display_name = self._format_metric_name(name)
-            return metric_id, display_name
+            # Fall back to an ID without persistence
+            return self._fallback_metric(service_id, name)
+    
+    def _upsert_metric(
+        self,
+        cursor: sqlite3.Cursor,
+        service_id: str,
+        name: str,
+        unit: str,
+        format_type: str,
+        decimal_places: int,
+        is_percentage: bool,
+        is_counter: bool,
+        otel_type: str,
+        now: str
+    ) -> Tuple[str, str]:
+        """
+        Insert or refresh a metric row using the caller's cursor.
+        
+        Does not commit, so several metrics can be written in one transaction.
+        
+        Args:
+            cursor: Cursor of an open connection
+            service_id: ID of the service this metric belongs to
+            name: Metric name (e.g., cpu_usage)
+            unit: Unit of measurement
+            format_type: How to format the value (number, percentage, bytes, etc.)
+            decimal_places: Number of decimal places for rounding
+            is_percentage: Whether this metric should be displayed as a percentage
+            is_counter: Whether this metric is a counter (integer)
+            otel_type: OpenTelemetry metric type (Gauge, Counter, UpDownCounter)
+            now: Timestamp used for first_seen/last_seen
+            
+        Returns:
+            Tuple of (metric_id, display_name)
+        """
+        include_otel_type = self._include_otel_type
+        param_values = self._metric_upsert_params(
+            service_id, name, unit, format_type, decimal_places,
+            is_percentage, is_counter, otel_type, now
+        )
+        # ID used only if the metric doesn't exist yet
+        new_metric_id = param_values[0]
+        
+        if SQLITE_HAS_UPSERT:
+            # Execute the query; RETURNING (or the follow-up SELECT on older
+            # SQLite) yields the stored row either way
+            cursor.execute(self._upsert_metric_sql, param_values)
+            if not SQLITE_HAS_RETURNING:
+                cursor.execute(_SELECT_METRIC_ID_SQL, (service_id, name))
+            metric_id, display_name = cursor.fetchone()
+        else:
+            metric_id, display_name = self._legacy_upsert_metric(cursor, param_values)
+        
+        # Log appropriate message based on schema
+        if not include_otel_type:
+            if self.metrics_columns is None:
+                logger.warning("Metrics schema cache is not available, falling back to legacy upsert pattern")
+            elif 'otel_type' not in self.metrics_columns:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"Schema inconsistency detected: 'otel_type' column not found in cached schema. Available columns: {sorted(self.metrics_columns)}")
+        
+        if metric_id == new_metric_id:
+            logger.info(f"Created new metric: {name} (ID: {metric_id}, Type: {otel_type})")
+        else:
+            # Runs for every already-known metric; let logging skip the formatting
+            logger.debug("Using existing metric: %s (ID: %s)", name, metric_id)
+            
+        return metric_id, display_name
+    
+    def _legacy_upsert_metric(self, cursor: sqlite3.Cursor, param_values: tuple) -> Tuple[str, str]:
+        """
+        Insert or refresh a metric row without ON CONFLICT DO UPDATE.
+        
+        Used on SQLite older than 3.24: looks the metric up, then updates
+        the existing row or inserts a new one. Does not commit.
+        
+        Args:
+            cursor: Cursor of an open connection
+            param_values: Parameters as built by _metric_upsert_params
+            
+        Returns:
+            Tuple of (metric_id, display_name)
+        """
+        params = dict(zip(self._insert_metric_params, param_values))
+        cursor.execute(_SELECT_METRIC_ID_SQL, (params['service_id'], params['name']))
+        result = cursor.fetchone()
+        
+        if result is None:
+            cursor.execute(self._insert_metric_sql, param_values)
+        else:
+            params['id'] = result[0]
+            cursor.execute(self._update_metric_sql, [params[param] for param in self._update_metric_params])
+            
+        return params['id'], params['display_name']
+    
+    def _metric_upsert_params(
+        self,
+        service_id: str,
+        name: str,
+        unit: str,
+        format_type: str,
+        decimal_places: int,
+        is_percentage: bool,
+        is_counter: bool,
+        otel_type: str,
+        now: str
+    ) -> tuple:
+        """
+        Build the parameters of the metric upsert statements.
+        
+        The first parameter is a freshly generated ID, used only if the
+        metric doesn't exist yet.
+        
+        Returns:
+            Tuple in the insert param_order of _build_metrics_query
+        """
+        display_name = self._format_metric_name(name)
+        if self._include_otel_type:
+            return (_new_row_id(), service_id, name, display_name, unit, format_type,
+                    decimal_places, is_percentage, is_counter, otel_type, now, now)
+        return (_new_row_id(), service_id, name, display_name, unit, format_type,
+                decimal_places, is_percentage, is_counter, now, now)
             
     def get_service_info(self, service_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -1026,21 +1611,13 @@ class MetadataStore:
                 )
                 result = cursor.fetchone()
                 
-                if result:
-                    return {
-                        'id': result[0],
-                        'full_name': result[1],
-                        'display_name': result[2],
-                        'version': result[3],
-                        'description': result[4]
-                    }
-                return None
+                return dict(result) if result else None
             
         except sqlite3.Error as e:
             logger.error(f"Error in get_service_info: {e}")
             return None
     
-    def get_metrics_for_service(self, service_id: str) -> List[Dict[str, Any]]:
+    def get_metrics_for_service(self, service_id: str) -> List[MetricRow]:
         """
         Get all metrics for a specific service.
         
@@ -1048,7 +1625,7 @@ class MetadataStore:
             service_id: ID of the service
             
         Returns:
-            List of metric information dictionaries
+            List of MetricRow records
         """
         try:
             with self._get_db_connection() as conn:
@@ -1062,26 +1639,16 @@ class MetadataStore:
                     """,
                     (service_id,)
                 )
-                results = cursor.fetchall()
-                
                 return [
-                    {
-                        'id': row[0],
-                        'name': row[1],
-                        'display_name': row[2],
-                        'unit': row[3],
-                        'format_type': row[4],
-                        'decimal_places': row[5],
-                        'is_percentage': bool(row[6])
-                    }
-                    for row in results
+                    MetricRow(row[0], row[1], row[2], row[3], row[4], row[5], bool(row[6]))
+                    for row in cursor.fetchall()
                 ]
             
         except sqlite3.Error as e:
             logger.error(f"Error in get_metrics_for_service: {e}")
             return []
     
-    def get_metric_info(self, service_id: str, name: str) -> Optional[Dict[str, Any]]:
+    def get_metric_info(self, service_id: str, name: str) -> Optional[MetricRow]:
         """
         Get information about a specific metric.
         
@@ -1090,7 +1657,7 @@ class MetadataStore:
             name: Metric name
             
         Returns:
-            Dictionary of metric information or None if not found
+            MetricRow record or None if not found
         """
         try:
             with self._get_db_connection() as conn:
@@ -1104,18 +1671,10 @@ class MetadataStore:
                     """,
                     (service_id, name)
                 )
-                result = cursor.fetchone()
-                
-                if result:
-                    return {
-                        'id': result[0],
-                        'display_name': result[1],
-                        'unit': result[2],
-                        'format_type': result[3],
-                        'decimal_places': result[4],
-                        'is_percentage': bool(result[5])
-                    }
-                return None
+                row = cursor.fetchone()
+                if row is None:
+                    return None
+                return MetricRow(row[0], name, row[1], row[2], row[3], row[4], bool(row[5]))
             
         except sqlite3.Error as e:
             logger.error(f"Error in get_metric_info: {e}")
@@ -1125,9 +1684,16 @@ class MetadataStore:
         """
         Get all format rules ordered by priority.
         
+        Rules rarely change, so results are cached for FORMAT_RULES_CACHE_TTL
+        seconds. The returned list is shared; callers must not modify it.
+        
         Returns:
             List of format rules as dictionaries
         """
+        if (self._format_rules_cache is not None and
+                time.monotonic() - self._format_rules_cache_time < FORMAT_RULES_CACHE_TTL):
+            return self._format_rules_cache
+        
         try:
             with self._get_db_connection() as conn:
                 cursor = conn.cursor()
@@ -1139,41 +1705,197 @@ class MetadataStore:
                     ORDER BY priority DESC
                     """
                 )
-                results = cursor.fetchall()
-                
-                return [
-                    {
-                        'pattern': row[0],
-                        'replacement': row[1],
-                        'rule_type': row[2],
-                        'priority': row[3]
-                    }
-                    for row in results
-                ]
+                self._format_rules_cache = [dict(row) for row in cursor.fetchall()]
+                self._format_rules_cache_time = time.monotonic()
+                return self._format_rules_cache
             
         except sqlite3.Error as e:
             logger.error(f"Error in get_format_rules: {e}")
-            # Return default rules if database access fails
-            return [
-                {
-                    'pattern': 'cpu',
-                    'replacement': 'CPU',
-                    'rule_type': 'word_replacement',
-                    'priority': 100
-                },
-                {
-                    'pattern': '_',
-                    'replacement': ' ',
-                    'rule_type': 'character_replacement',
-                    'priority': 50
-                },
-                {
-                    'pattern': 'word_start',
-                    'replacement': 'capitalize',
-                    'rule_type': 'word_formatting',
-                    'priority': 10
-                }
-            ]
+            # Return default rules if database access fails, and keep serving
+            # them until the TTL expires rather than retrying on every call
+            self._format_rules_cache = _default_format_rules()
+            self._format_rules_cache_time = time.monotonic()
+            return self._format_rules_cache
+    
+    def _invalidate_format_rules_cache(self):
+        """Drop cached format rules so the next read goes to the database."""
+        self._format_rules_cache = None
+        self._format_rules_cache_time = 0.0
+    
+    def _clear_lookup_caches(self):
+        """Drop all cached service and metric lookups."""
+        # Keyed on the get_or_create_* arguments; values are
+        # (id, display_name, monotonic time the row was last written)
+        self._service_cache = {}
+        self._metric_cache = {}
+    
+    def _get_cached_lookup(self, cache: Dict[tuple, tuple], key: tuple) -> Optional[Tuple[str, str]]:
+        """
+        Return a cached (id, display_name) pair if it is still fresh.
+        
+        Args:
+            cache: Service or metric lookup cache
+            key: Arguments of the get_or_create_* call
+            
+        Returns:
+            Tuple of (id, display_name), or None on a miss or expired entry
+        """
+        entry = cache.get(key)
+        if entry is not None and time.monotonic() - entry[2] < LOOKUP_CACHE_REFRESH_INTERVAL:
+            self._stats['lookup_cache_hits'] += 1
+            return entry[0], entry[1]
+        self._stats['lookup_cache_misses'] += 1
+        return None
+    
+    def _fallback_service(self, full_name: str) -> Tuple[str, str]:
+        """
+        Get the non-persistent (service_id, display_name) used when the
+        database cannot be written, generating it on first use.
+        
+        Args:
+            full_name: Raw service name
+        """
+        fallback = self._fallback_service_ids.get(full_name)
+        if fallback is None:
+            fallback = (str(uuid.uuid4()), _service_display_name(full_name))
+            self._fallback_service_ids[full_name] = fallback
+        return fallback
+    
+    def _fallback_metric(self, service_id: str, name: str) -> Tuple[str, str]:
+        """
+        Get the non-persistent (metric_id, display_name) used when the
+        database cannot be written, generating it on first use.
+        
+        Args:
+            service_id: ID of the service this metric belongs to
+            name: Metric name
+        """
+        key = (service_id, name)
+        fallback = self._fallback_metric_ids.get(key)
+        if fallback is None:
+            fallback = (_new_row_id(), _format_metric_name(name))
+            self._fallback_metric_ids[key] = fallback
+        return fallback
+    
+    def _record_upsert(self, started: float):
+        """
+        Count a committed get_or_create_* upsert.
+        
+        Args:
+            started: time.perf_counter() value taken before the transaction
+        """
+        self._stats['db_upserts'] += 1
+        self._stats['db_upsert_seconds'] += time.perf_counter() - started
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get counters describing how lookups were served.
+        
+        Cache hits are get_or_create_service/get_or_create_metric calls
+        answered from memory; misses went to the database, and their upserts
+        are counted with their total duration.
+        
+        Returns:
+            Dictionary of counters plus the lookup cache hit ratio
+        """
+        stats = dict(self._stats)
+        lookups = stats['lookup_cache_hits'] + stats['lookup_cache_misses']
+        stats['lookup_cache_hit_ratio'] = stats['lookup_cache_hits'] / lookups if lookups else 0.0
+        return stats
+    
+    def _touch_last_seen(self, table: str, row_id: str):
+        """
+        Record that a row was seen, writing it later in a batch.
+        
+        Args:
+            table: 'services' or 'metrics'
+            row_id: ID of the row that was seen
+        """
+        now = time.time()
+        with self._pending_touches_lock:
+            self._pending_touches[(table, row_id)] = now
+            flush_due = (len(self._pending_touches) >= LAST_SEEN_FLUSH_SIZE or
+                         now - self._last_touch_flush >= LAST_SEEN_FLUSH_INTERVAL)
+            if not flush_due and self._flush_timer is None:
+                self._flush_timer = threading.Timer(LAST_SEEN_FLUSH_INTERVAL, self._flush_last_seen_in_background)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+        if flush_due:
+            self._flush_last_seen()
+    
+    def _flush_last_seen_in_background(self):
+        """Timer callback: flush pending refreshes, then close the timer thread's connection."""
+        try:
+            self._flush_last_seen()
+        finally:
+            with self._connections_lock:
+                conn = self._connections.pop(threading.current_thread(), None)
+            if conn is not None:
+                self._close_connections([conn])
+    
+    def _flush_last_seen(self):
+        """Write all pending last_seen refreshes in a single transaction."""
+        with self._pending_touches_lock:
+            touches, self._pending_touches = self._pending_touches, {}
+            self._last_touch_flush = time.time()
+            timer, self._flush_timer = self._flush_timer, None
+        if timer is not None and timer is not threading.current_thread():
+            timer.cancel()
+        if not touches:
+            return
+        
+        updates = {}
+        for (table, row_id), seen in touches.items():
+            timestamp = _format_timestamp(seen)
+            updates.setdefault(table, []).append((timestamp, row_id))
+        
+        try:
+            with self._write_transaction() as conn:
+                cursor = conn.cursor()
+                for table, params in updates.items():
+                    cursor.executemany(_LAST_SEEN_UPDATES[table], params)
+            self._stats['last_seen_flushes'] += 1
+            logger.debug(f"Flushed {len(touches)} last_seen updates")
+        except sqlite3.Error as e:
+            logger.warning(f"Error flushing last_seen updates: {e}")
+            return
+        
+        self._checkpoint_wal()
+    
+    def _checkpoint_wal(self):
+        """
+        Checkpoint and truncate the write-ahead log, at most once per
+        WAL_CHECKPOINT_INTERVAL seconds.
+        
+        wal_autocheckpoint keeps the log from growing between calls; the
+        TRUNCATE checkpoint also resets the -wal file to zero bytes so that
+        readers do not have to search a large log.
+        """
+        now = time.monotonic()
+        if self.db_path == ":memory:" or now - self._last_wal_checkpoint < WAL_CHECKPOINT_INTERVAL:
+            return
+        self._last_wal_checkpoint = now
+        
+        try:
+            busy, log_pages, checkpointed = self._get_thread_connection().execute(
+                "PRAGMA wal_checkpoint(TRUNCATE)"
+            ).fetchone()
+            logger.debug(f"WAL checkpoint: busy={busy}, log={log_pages}, checkpointed={checkpointed}")
+        except sqlite3.Error as e:
+            logger.warning(f"Error checkpointing metadata database WAL: {e}")
+    
+    def _forget_cached_metrics(self, service_id: str, names):
+        """
+        Drop cached lookups for metrics that were removed from the database.
+        
+        Args:
+            service_id: ID of the service the metrics belonged to
+            names: Names of the removed metrics
+        """
+        names = set(names)
+        for key in list(self._metric_cache):
+            if key[0] == service_id and key[1] in names:
+                self._metric_cache.pop(key, None)
             
     def _extract_service_display_name(self, full_name: str) -> str:
         """
@@ -1185,11 +1907,7 @@ class MetadataStore:
         Returns:
             Display name (e.g., Microstrategy M8mulprc)
         """
-        # Extract the part after the last dot
-        base_name = full_name.split('.')[-1]
-            
-        # Format the display name
-        return self._format_metric_name(base_name)
+        return _service_display_name(full_name)
         
     def _format_metric_name(self, name: str) -> str:
         """
@@ -1201,24 +1919,7 @@ class MetadataStore:
         Returns:
             Formatted display name (e.g., CPU Usage Total)
         """
-        # Handle parameterized metrics
-        if '{' in name and '}' in name:
-            # For names like 'cpu_core_{index}', format the base name
-            base_name = name.split('{')[0].strip('_')
-            parameter = name[name.find('{'):]
-            return f"{self._format_metric_name(base_name)} {parameter}"
-            
-        # General formatting rules
-        display_name = name.replace('_', ' ').replace('.', ' ')
-        
-        # Capitalize words, handling acronyms like CPU
-        words = display_name.split()
-        formatted_words = [
-            word.upper() if word.lower() == 'cpu' else word.capitalize()
-            for word in words
-        ]
-        
-        return ' '.join(formatted_words)
+        return _format_metric_name(name)
         
     def get_simple_metric_name(self, full_metric_name: str) -> str:
         """
@@ -1233,15 +1934,7 @@ class MetadataStore:
         Returns:
             The simple metric name for OpenTelemetry registration
         """
-        if not full_metric_name:
-            return "unknown"
-            
-        # For parameterized metrics, return the name as is
-        if '{' in full_metric_name and '}' in full_metric_name:
-            return full_metric_name
-            
-        # For other metrics, sanitize to ensure compliance
-        return self.sanitize_for_metrics(full_metric_name)
+        return _simple_metric_name(full_metric_name)
     
     def sync_metric_from_toml(
         self,
@@ -1284,13 +1977,94 @@ class MetadataStore:
             service_id=service_id,
             name=name,
             unit=unit,
-            format_type="counter" if is_counter else ("percentage" if is_percentage else "number"),
+            format_type=_FORMAT_TYPES[(bool(is_counter) << 1) | bool(is_percentage)],
             decimal_places=decimals,
             is_percentage=is_percentage,
             is_counter=is_counter,
             otel_type=otel_type
         )
-    
+
+    def sync_metrics_from_toml_batch(
+        self,
+        service_id: str,
+        metric_definitions: List[Dict[str, Any]]
+    ) -> Dict[str, Tuple[str, str]]:
+        """
+        Sync a list of TOML metric definitions to the database in one transaction.
+
+        Equivalent to calling sync_metric_from_toml for each definition, but
+        all rows are written by one executemany under a single BEGIN
+        IMMEDIATE/COMMIT so the sync costs one fsync instead of one per
+        metric. The stored IDs and display names are then read back with a
+        single SELECT for the service.
+
+        Args:
+            service_id: ID of the service the metrics belong to
+            metric_definitions: Metric dictionaries as returned by get_expanded_metrics
+
+        Returns:
+            Dictionary mapping metric name to (metric_id, display_name)
+        """
+        # One timestamp for the whole batch, computed before taking the write lock
+        now = _current_timestamp()
+        try:
+            with self._write_transaction() as conn:
+                cursor = conn.cursor()
+
+                cache_keys = []
+                rows = []
+                for metric_def in metric_definitions:
+                    name = metric_def['name']
+                    is_percentage = metric_def.get('is_percentage', False)
+                    is_counter = metric_def.get('is_counter', False)
+                    # Same argument order as get_or_create_metric's cache key
+                    cache_key = (
+                        service_id,
+                        name,
+                        metric_def.get('unit', ""),
+                        _FORMAT_TYPES[(bool(is_counter) << 1) | bool(is_percentage)],
+                        metric_def.get('decimals', 2),
+                        is_percentage,
+                        is_counter,
+                        metric_def.get('otel_type', 'Gauge')
+                    )
+                    rows.append(self._metric_upsert_params(*cache_key, now))
+                    cache_keys.append(cache_key)
+
+                if SQLITE_HAS_UPSERT:
+                    cursor.executemany(self._bulk_upsert_metric_sql, rows)
+                else:
+                    for row in rows:
+                        self._legacy_upsert_metric(cursor, row)
+                
+                requested = {cache_key[1] for cache_key in cache_keys}
+                cursor.execute(_SELECT_SERVICE_METRIC_IDS_SQL, (service_id,))
+                synced = {
+                    name: (metric_id, display_name)
+                    for name, metric_id, display_name in cursor.fetchall()
+                    if name in requested
+                }
+
+            new_ids = {row[0] for row in rows}
+            for name, (metric_id, _) in synced.items():
+                if metric_id in new_ids:
+                    logger.info(f"Created new metric: {name} (ID: {metric_id})")
+
+            # Only cache once the rows are committed
+            refreshed_at = time.monotonic()
+            for cache_key in cache_keys:
+                self._metric_cache[cache_key] = synced[cache_key[1]] + (refreshed_at,)
+            logger.debug(f"Synced {len(synced)} metrics for service {service_id} in one transaction")
+            return synced
+
+        except sqlite3.Error as e:
+            logger.error(f"Error in sync_metrics_from_toml_batch: {e}")
+            # Fall back to IDs without persistence
+            return {
+                metric_def['name']: self._fallback_metric(service_id, metric_def['name'])
+                for metric_def in metric_definitions
+            }
+
     def get_service_metrics(self, service_id: str) -> List[Dict[str, Any]]:
         """
         Get all metrics for a service from the database registry.
@@ -1299,53 +2073,14 @@ class MetadataStore:
             service_id: ID of the service
             
         Returns:
-            List of metric dictionaries with all required fields
+            List of metric dictionaries with all required fields (is_percentage
+            and is_counter are returned as stored, 0 or 1)
         """
         try:
             with self._get_db_connection() as conn:
                 cursor = conn.cursor()
-                
-                # Check if otel_type column exists
-                include_otel_type = self.metrics_columns and 'otel_type' in self.metrics_columns
-                
-                if include_otel_type:
-                    cursor.execute(
-                        """
-                        SELECT id, name, display_name, unit, format_type, 
-                               decimal_places, is_percentage, is_counter, otel_type
-                        FROM metrics
-                        WHERE service_id = ?
-                        """,
-                        (service_id,)
-                    )
-                else:
-                    cursor.execute(
-                        """
-                        SELECT id, name, display_name, unit, format_type, 
-                               decimal_places, is_percentage, is_counter
-                        FROM metrics
-                        WHERE service_id = ?
-                        """,
-                        (service_id,)
-                    )
-                
-                results = cursor.fetchall()
-                
-                metrics = []
-                for row in results:
-                    metric = {
-                        'id': row[0],
-                        'name': row[1], 
-                        'display_name': row[2],
-                        'unit': row[3],
-                        'format_type': row[4],
-                        'decimal_places': row[5],
-                        'is_percentage': bool(row[6]),
-                        'is_counter': bool(row[7]),
-                        'otel_type': row[8] if include_otel_type and len(row) > 8 else 'Gauge',
-                        'description': f"Metric for {row[1]}"  # Generate description if not stored
-                    }
-                    metrics.append(metric)
+                cursor.execute(self._service_metrics_sql, (service_id,))
+                metrics = [dict(row) for row in cursor.fetchall()]
                 
                 logger.debug(f"Retrieved {len(metrics)} metrics for service {service_id}")
                 return metrics
@@ -1366,35 +2101,37 @@ class MetadataStore:
             Number of metrics removed
         """
         try:
-            with self._get_db_connection() as conn:
+            # The read decides what is deleted, so take the write lock first
+            with self._write_transaction() as conn:
                 cursor = conn.cursor()
                 
                 # Get all metrics currently in database for this service
                 cursor.execute(
-                    "SELECT id, name FROM metrics WHERE service_id = ?",
+                    "SELECT name, id FROM metrics WHERE service_id = ?",
                     (service_id,)
                 )
-                database_metrics = cursor.fetchall()
+                database_metrics = dict(cursor.fetchall())
                 
                 # Find metrics to remove (in database but not in current TOML)
-                metrics_to_remove = []
-                for metric_id, metric_name in database_metrics:
-                    if metric_name not in current_metric_names:
-                        metrics_to_remove.append((metric_id, metric_name))
-                
-                # Remove obsolete metrics
-                removed_count = 0
-                for metric_id, metric_name in metrics_to_remove:
-                    cursor.execute("DELETE FROM metrics WHERE id = ?", (metric_id,))
-                    removed_count += 1
-                    logger.info(f"Removed obsolete metric: {metric_name} (ID: {metric_id})")
-                
-                conn.commit()
-                
-                if removed_count > 0:
-                    logger.info(f"Removed {removed_count} obsolete metrics for service {service_id}")
+                obsolete_names = sorted(database_metrics.keys() - current_metric_names)
+
+                # Remove obsolete metrics with one DELETE per chunk of IDs,
+                # keeping each statement below SQLite's bound-parameter limit
+                ids_to_remove = [database_metrics[name] for name in obsolete_names]
+                for start in range(0, len(ids_to_remove), SQLITE_MAX_BATCH_PARAMS):
+                    chunk = ids_to_remove[start:start + SQLITE_MAX_BATCH_PARAMS]
+                    placeholders = ', '.join('?' * len(chunk))
+                    cursor.execute(f"DELETE FROM metrics WHERE id IN ({placeholders})", chunk)
+
+                for metric_name in obsolete_names:
+                    logger.info(f"Removed obsolete metric: {metric_name} (ID: {database_metrics[metric_name]})")
+                removed_count = len(obsolete_names)
+                self._forget_cached_metrics(service_id, obsolete_names)
                 
-                return removed_count
+            if removed_count > 0:
+                logger.info(f"Removed {removed_count} obsolete metrics for service {service_id}")
+            
+            return removed_count
             
         except sqlite3.Error as e:
             logger.error(f"Error in remove_obsolete_metrics: {e}")
@@ -1419,13 +2156,7 @@ class MetadataStore:
         Returns:
             Formatted value (as integer for counters, rounded float otherwise)
         """
-        # Convert to percentage if required
-        if is_percentage and value <= 1.0:
-            value = value * 100.0
-            
-        # For counters, return as integer (rounded)
-        if is_counter:
-            return int(round(value))
-            
-        # Otherwise round to specified decimal places
-        return round(value, decimal_places)
+        # Percentages at or below 1.0 are fractions and are scaled by 100;
+        # counters are returned as rounded integers, everything else is
+        # rounded to the requested decimal places
+        return _make_formatter(is_percentage, is_counter, decimal_places)(value)
@@ -7,17 +7,22 @@ Copyright (c) 2025 laplaque/instana_plugins Contributors
 
 This file is part of the Instana Plugins collection.
 """
-from common.logging_config import setup_logging
-
-setup_logging()  # Configure logging at the start of the module
 import os
-import json
+import contextlib
+import functools
+import inspect
 import logging
-import re
-from typing import Dict, Any, Optional, List
+from types import MappingProxyType
+from typing import Dict, Any, Optional
 import socket
 import sys
 
+# Accepted spellings for boolean settings
+_BOOL_VALUES = {
+    'y': True, 'yes': True, 't': True, 'true': True, 'on': True, '1': True,
+    'n': False, 'no': False, 'f': False, 'false': False, 'off': False, '0': False,
+}
+
 # Custom implementation of strtobool to replace distutils.util.strtobool
 def strtobool(val):
     """Convert a string representation of truth to True or False.
@@ -26,17 +31,151 @@ def strtobool(val):
     False values are 'n', 'no', 'f', 'false', 'off', and '0'.
     Raises ValueError if 'val' is anything else.
     """
-    val = val.lower()
-    if val in ('y', 'yes', 't', 'true', 'on', '1'):
-        return True
-    elif val in ('n', 'no', 'f', 'false', 'off', '0'):
-        return False
-    else:
-        raise ValueError(f"Invalid truth value: {val}")
+    result = _BOOL_VALUES.get(val.lower())
+    if result is None:
+        raise ValueError(f"Invalid truth value: {val.lower()}")
+    return result
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# BatchSpanProcessor defaults, tuned for bursty span traffic
+DEFAULT_BSP_MAX_QUEUE_SIZE = 4096
+DEFAULT_BSP_SCHEDULE_DELAY_MILLIS = 1000
+# Keeps a batch of spans well under the 4MB default gRPC message limit
+DEFAULT_BSP_MAX_EXPORT_BATCH_SIZE = 128
+DEFAULT_BSP_EXPORT_TIMEOUT_MILLIS = 10000
+
+# Per-request OTLP deadline, so an unreachable agent cannot stall the export worker
+DEFAULT_OTLP_TIMEOUT_MILLIS = 5000
+
+# Metric export interval default and the upper bound for a single export
+DEFAULT_METRIC_EXPORT_INTERVAL_MILLIS = 60000
+MAX_METRIC_EXPORT_TIMEOUT_MILLIS = 30000
+
+# How long shutdown waits for pending spans and metrics to be exported
+SHUTDOWN_FLUSH_TIMEOUT_MILLIS = 5000
+
+# Values accepted for OTEL_EXPORTER_OTLP_COMPRESSION
+OTLP_COMPRESSION_ALGORITHMS = ('gzip', 'deflate', 'none')
+
+# HTTP/2 keepalive pings keep idle export connections open between intervals
+GRPC_KEEPALIVE_OPTIONS = (
+    ("grpc.keepalive_time_ms", 30000),
+    ("grpc.keepalive_timeout_ms", 10000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+)
+
+# Resource, tracer and meter providers shared by connectors whose exporter and
+# resource settings all match, so repeated connectors do not install duplicate
+# providers and exporters. Each entry counts its connectors in 'users'.
+_PROVIDER_CACHE: Dict[tuple, Dict[str, Any]] = {}
+
+def _int_setting(env_var, value, default, minimum, maximum):
+    """Read an integer setting from the environment, falling back to value then default.
+
+    The result is clamped to [minimum, maximum]; invalid values log a warning
+    and use the default.
+    """
+    raw = os.environ.get(env_var, value)
+    if raw is None:
+        return default
+    try:
+        parsed = int(raw)
+    except (ValueError, TypeError):
+        logger.warning(f"Invalid {env_var} value {raw!r}, using default: {default}")
+        return default
+    return max(minimum, min(parsed, maximum))
+
+# Stand-in for a span when OpenTelemetry is not available; nullcontext is
+# stateless, so one instance serves every create_span call
+_NULL_SPAN = contextlib.nullcontext()
+
+@functools.lru_cache(maxsize=None)
+def _grpc_compression_algorithms():
+    """Map compression names to grpc.Compression values, importing grpc once per process.
+
+    Returns an empty mapping, after a single warning, if grpc is not importable.
+    """
+    try:
+        from grpc import Compression
+    except ImportError:
+        logger.warning("grpc package not available, exporting without compression")
+        return {}
+
+    return {
+        'gzip': Compression.Gzip,
+        'deflate': Compression.Deflate,
+        'none': Compression.NoCompression,
+    }
+
+@functools.lru_cache(maxsize=None)
+def _accepts_channel_options(exporter_class):
+    """Return whether an OTLP exporter class takes gRPC channel options, checked once per class.
+
+    Exporters accepting arbitrary keyword arguments are assumed to pass them on.
+    """
+    try:
+        parameters = inspect.signature(exporter_class).parameters
+    except (TypeError, ValueError):
+        return False
+    supported = 'channel_options' in parameters or any(
+        parameter.kind is inspect.Parameter.VAR_KEYWORD for parameter in parameters.values())
+    if not supported:
+        logger.warning(f"Installed {getattr(exporter_class, '__name__', 'OTLP exporter')} "
+                       "does not support gRPC channel options, using defaults")
+    return supported
+
+@functools.lru_cache(maxsize=None)
+def _hostname():
+    """Return the local hostname, resolved once per process."""
+    return socket.gethostname()
+
+@functools.lru_cache(maxsize=None)
+def _base_resource_attributes():
+    """Return the read-only resource attributes shared by every connector in the process."""
+    return MappingProxyType({"host.name": _hostname()})
+
+class _MetricCallback:
+    """
+    Observable callback reporting one metric from the connector's state.
+
+    The formatting rule from manifest.toml is chosen once at creation, so each
+    collection is a dict lookup plus a single conversion.
+    """
+    __slots__ = ('state', 'metric_name', 'log_name', 'scale', 'as_integer', 'decimal_places')
+
+    def __init__(self, state, metric_name, is_percentage=False, is_counter=False,
+                 decimal_places=2, display_name=None):
+        self.state = state
+        self.metric_name = metric_name
+        # Use the provided display name or the metric name for logging
+        self.log_name = display_name or metric_name
+        # Percentages (e.g., 25.5% or 250% for multi-core CPU) are reported in decimal form
+        self.scale = 100.0 if is_percentage else 1.0
+        # Counters and metrics with 0 decimals are reported as integers
+        self.as_integer = not is_percentage and (is_counter or decimal_places == 0)
+        self.decimal_places = decimal_places
+
+    def __call__(self, options):
+        try:
+            raw_value = self.state.get(self.metric_name)
+            if raw_value is None:
+                return ()
+
+            if self.as_integer:
+                value = int(float(raw_value))
+            else:
+                value = round(float(raw_value) / self.scale, self.decimal_places)
+
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Observed metric {self.log_name}={value}")
+            return (Observation(value),)
+        except Exception as e:
+            logger.error(f"Error in metric callback for {self.metric_name}: {e}")
+            return ()
+
 # Import metadata store - this is required
 try:
     from common.metadata_store import MetadataStore
@@ -53,22 +192,43 @@ except ImportError as e:
     logger.error(f"TOML utilities not found: {e}")
     get_expanded_metrics = None
 
-# OpenTelemetry imports
-try:
-    from opentelemetry import trace
-    from opentelemetry.sdk.trace import TracerProvider
-    from opentelemetry.sdk.trace.export import BatchSpanProcessor
-    from opentelemetry.sdk.resources import Resource
-    from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
-    from opentelemetry.sdk.metrics import MeterProvider
-    from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
-    from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import OTLPMetricExporter
-    from opentelemetry.metrics import set_meter_provider, get_meter_provider, Observation
-    OPENTELEMETRY_AVAILABLE = True
-except ImportError:
-    logger.error("OpenTelemetry packages not found. Please install required dependencies.")
-    logger.error("Run: pip install opentelemetry-api opentelemetry-sdk opentelemetry-exporter-otlp")
-    OPENTELEMETRY_AVAILABLE = False
+# OpenTelemetry is imported on first use, see _load_opentelemetry()
+OPENTELEMETRY_AVAILABLE = None
+trace = TracerProvider = BatchSpanProcessor = Resource = OTLPSpanExporter = None
+MeterProvider = PeriodicExportingMetricReader = OTLPMetricExporter = None
+set_meter_provider = get_meter_provider = Observation = None
+
+def _load_opentelemetry():
+    """Import the OpenTelemetry SDK and OTLP exporters on first use.
+
+    Importing this module stays cheap; the SDK, gRPC and protobuf are only
+    loaded once a connector is created.
+
+    Returns:
+        bool: Whether the OpenTelemetry packages are available
+    """
+    global OPENTELEMETRY_AVAILABLE, trace, TracerProvider, BatchSpanProcessor, Resource
+    global OTLPSpanExporter, MeterProvider, PeriodicExportingMetricReader, OTLPMetricExporter
+    global set_meter_provider, get_meter_provider, Observation
+    if OPENTELEMETRY_AVAILABLE is not None:
+        return OPENTELEMETRY_AVAILABLE
+
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.metrics import MeterProvider
+        from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
+        from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import OTLPMetricExporter
+        from opentelemetry.metrics import set_meter_provider, get_meter_provider, Observation
+        OPENTELEMETRY_AVAILABLE = True
+    except ImportError:
+        logger.error("OpenTelemetry packages not found. Please install required dependencies.")
+        logger.error("Run: pip install opentelemetry-api opentelemetry-sdk opentelemetry-exporter-otlp")
+        OPENTELEMETRY_AVAILABLE = False
+    return OPENTELEMETRY_AVAILABLE
 
 class InstanaOTelConnector:
     """
@@ -89,7 +249,14 @@ class InstanaOTelConnector:
         client_cert_path: Optional[str] = None,
         client_key_path: Optional[str] = None,
         metadata_db_path: Optional[str] = None,
-        service_namespace: str = "Unknown"
+        service_namespace: str = "Unknown",
+        max_queue_size: Optional[int] = None,
+        schedule_delay_millis: Optional[int] = None,
+        max_export_batch_size: Optional[int] = None,
+        export_timeout_millis: Optional[int] = None,
+        compression: Optional[str] = None,
+        metric_export_interval_millis: Optional[int] = None,
+        otlp_timeout_millis: Optional[int] = None
     ):
         """
         Initialize the Instana OpenTelemetry connector.
@@ -103,6 +270,16 @@ class InstanaOTelConnector:
             ca_cert_path: Path to CA certificate file for TLS verification (optional)
             client_cert_path: Path to client certificate file for TLS authentication (optional)
             client_key_path: Path to client key file for TLS authentication (optional)
+            max_queue_size: Span queue size (env: OTEL_BSP_MAX_QUEUE_SIZE, default: 4096)
+            schedule_delay_millis: Delay between span exports (env: OTEL_BSP_SCHEDULE_DELAY, default: 1000)
+            max_export_batch_size: Spans per export (env: OTEL_BSP_MAX_EXPORT_BATCH_SIZE, default: 128)
+            export_timeout_millis: Span export timeout (env: OTEL_BSP_EXPORT_TIMEOUT, default: 10000)
+            compression: OTLP export compression, "gzip", "deflate" or "none"
+                (env: OTEL_EXPORTER_OTLP_COMPRESSION, default: gzip)
+            metric_export_interval_millis: Interval between metric exports
+                (env: OTEL_METRIC_EXPORT_INTERVAL, default: 60000)
+            otlp_timeout_millis: Deadline for each OTLP export request
+                (env: OTEL_EXPORTER_OTLP_TIMEOUT, default: 5000)
         """
         # Add a metrics state dictionary to store current metric values
         self._metrics_state = {}
@@ -110,7 +287,13 @@ class InstanaOTelConnector:
         # Add a registry to track registered metrics
         self._metrics_registry = set()
         
-        # Initialize metadata store - this is required
+        # Metric definitions whose instrument is created on the first recorded value
+        self._pending_observables = {}
+        
+        # Observable instruments by metric name, created at most once each
+        self._observables = {}
+        
+        # Initialize metadata store - this is required, and the first store configures logging
         try:
             self._metadata_store = MetadataStore(db_path=metadata_db_path)
             logger.info(f"Initialized metadata store at: {self._metadata_store.db_path}")
@@ -130,18 +313,46 @@ class InstanaOTelConnector:
             logger.warning(f"Invalid port specified, using default: {self.agent_port}")
         
         # Parse TLS settings from environment or use provided values
-        try:
-            env_use_tls = os.environ.get('USE_TLS')
-            self.use_tls = bool(strtobool(env_use_tls)) if env_use_tls is not None else (use_tls or False)
-        except (ValueError, AttributeError):
+        env_use_tls = os.environ.get('USE_TLS', '')
+        self.use_tls = _BOOL_VALUES.get(env_use_tls.lower())
+        if self.use_tls is None:
             self.use_tls = use_tls or False
-            logger.warning(f"Invalid USE_TLS value, using: {self.use_tls}")
+            if env_use_tls:
+                logger.warning(f"Invalid USE_TLS value, using: {self.use_tls}")
         
         # Get certificate paths from environment or use provided values
         self.ca_cert_path = os.environ.get('CA_CERT_PATH', ca_cert_path)
         self.client_cert_path = os.environ.get('CLIENT_CERT_PATH', client_cert_path)
         self.client_key_path = os.environ.get('CLIENT_KEY_PATH', client_key_path)
         
+        # Parse BatchSpanProcessor settings from environment or use provided values
+        self.bsp_max_queue_size = _int_setting(
+            'OTEL_BSP_MAX_QUEUE_SIZE', max_queue_size, DEFAULT_BSP_MAX_QUEUE_SIZE, 1, 1000000)
+        self.bsp_schedule_delay_millis = _int_setting(
+            'OTEL_BSP_SCHEDULE_DELAY', schedule_delay_millis, DEFAULT_BSP_SCHEDULE_DELAY_MILLIS, 1, 600000)
+        # A batch can never be larger than the queue feeding it
+        self.bsp_max_export_batch_size = _int_setting(
+            'OTEL_BSP_MAX_EXPORT_BATCH_SIZE', max_export_batch_size, DEFAULT_BSP_MAX_EXPORT_BATCH_SIZE,
+            1, self.bsp_max_queue_size)
+        self.bsp_export_timeout_millis = _int_setting(
+            'OTEL_BSP_EXPORT_TIMEOUT', export_timeout_millis, DEFAULT_BSP_EXPORT_TIMEOUT_MILLIS, 1, 600000)
+        
+        # Parse the metric export interval; each export must finish before the next starts
+        self.metric_export_interval_millis = _int_setting(
+            'OTEL_METRIC_EXPORT_INTERVAL', metric_export_interval_millis,
+            DEFAULT_METRIC_EXPORT_INTERVAL_MILLIS, 2000, 3600000)
+        self.metric_export_timeout_millis = min(
+            self.metric_export_interval_millis - 1000, MAX_METRIC_EXPORT_TIMEOUT_MILLIS)
+        
+        self.otlp_timeout_millis = _int_setting(
+            'OTEL_EXPORTER_OTLP_TIMEOUT', otlp_timeout_millis, DEFAULT_OTLP_TIMEOUT_MILLIS, 100, 600000)
+        
+        # Parse export compression from environment or use provided value
+        self.compression = os.environ.get('OTEL_EXPORTER_OTLP_COMPRESSION', compression or 'gzip').strip().lower()
+        if self.compression not in OTLP_COMPRESSION_ALGORITHMS:
+            logger.warning(f"Invalid OTEL_EXPORTER_OTLP_COMPRESSION value {self.compression!r}, using: gzip")
+            self.compression = 'gzip'
+        
         # Log TLS configuration
         if self.use_tls:
             logger.info(f"TLS encryption enabled for OpenTelemetry connection to {self.agent_host}:{self.agent_port}")
@@ -152,7 +363,7 @@ class InstanaOTelConnector:
         
         # Get service ID and display name from metadata store
         try:
-            hostname = socket.gethostname()
+            hostname = _hostname()
             self.service_id, self.display_name = self._metadata_store.get_or_create_service(
                 service_name, 
                 hostname=hostname, 
@@ -169,28 +380,59 @@ class InstanaOTelConnector:
             logger.error("Cannot continue without a valid service ID.")
             raise RuntimeError(f"Failed to get service ID: {e}")
         
-        # Store OpenTelemetry standard resource attributes
+        # Store OpenTelemetry standard resource attributes: the process-wide base
+        # merged with this connector's own values and custom resource attributes
         self.attributes = {
+            **_base_resource_attributes(),
             "service.name": getattr(self, 'display_name', service_name),  # Use self.display_name with fallback to self.service_name
             "service.namespace": service_namespace,
             "service.instance.id": self.service_id,  # OpenTelemetry standard attribute
             "host.id": self.host_id,                 # OpenTelemetry standard attribute  
-            "host.name": hostname,
+            **(resource_attributes or {}),
         }
         
-        # Add custom resource attributes if provided
-        if resource_attributes:
-            self.attributes.update(resource_attributes)
+        # Connectors share providers only when every exporter and resource setting matches
+        self._provider_key = (
+            self.service_name, self.agent_host, self.agent_port, self.use_tls,
+            self.ca_cert_path, self.client_cert_path, self.client_key_path,
+            self.compression, self.otlp_timeout_millis,
+            self.bsp_max_queue_size, self.bsp_schedule_delay_millis,
+            self.bsp_max_export_batch_size, self.bsp_export_timeout_millis,
+            self.metric_export_interval_millis,
+            repr(sorted(self.attributes.items())),
+        )
         
         # Only proceed with OpenTelemetry setup if it's available
-        if OPENTELEMETRY_AVAILABLE:
-            self.resource = Resource.create(self.attributes)
-            
-            # Initialize tracer
-            self._setup_tracing()
+        if _load_opentelemetry():
+            # gRPC compression setting shared by both exporters, None without grpc
+            self._grpc_compression = _grpc_compression_algorithms().get(self.compression)
+            
+            # Connectors sharing providers also share the resource they were built with
+            providers = _PROVIDER_CACHE.get(self._provider_key)
+            if providers is None:
+                providers = _PROVIDER_CACHE[self._provider_key] = {
+                    'resource': Resource.create(self.attributes),
+                    'users': 0,
+                    # A meter keeps one instrument per metric name, so sharing
+                    # connectors record into one state read by that instrument
+                    'metrics_state': {},
+                    'observables': {},
+                }
+            providers['users'] += 1
+            self._providers = providers
+            self.resource = providers['resource']
+            self._metrics_state = providers['metrics_state']
+            self._observables = providers['observables']
             
-            # Initialize metrics
-            self._setup_metrics()
+            try:
+                # Initialize tracer
+                self._setup_tracing()
+                
+                # Initialize metrics
+                self._setup_metrics()
+            except Exception:
+                self._release_providers()
+                raise
             
             logger.info(f"Initialized InstanaOTelConnector for service {service_name}")
         else:
@@ -198,6 +440,29 @@ class InstanaOTelConnector:
             logger.warning(f"To enable OpenTelemetry, install required packages:")
             logger.warning(f"pip install opentelemetry-api opentelemetry-sdk opentelemetry-exporter-otlp")
     
+    def _release_providers(self):
+        """
+        Release this connector's use of its shared providers.
+        
+        The last connector to release them stops the meter provider's periodic
+        reader and evicts the cache entry, so a stopped provider is never reused.
+        Releasing more than once has no effect.
+        """
+        providers, self._providers = getattr(self, '_providers', None), None
+        if providers is None:
+            return
+        
+        providers['users'] -= 1
+        if providers['users'] > 0:
+            logger.debug(f"Providers for {self.service_name} still used by {providers['users']} connector(s)")
+            return
+        
+        if _PROVIDER_CACHE.get(self._provider_key) is providers:
+            del _PROVIDER_CACHE[self._provider_key]
+        meter_provider = providers.get('meter')
+        if meter_provider is not None:
+            meter_provider.shutdown()
+    
     def _handle_connection_error(self, error, component_name):
         """
         Handle ConnectionError consistently across tracing and metrics setup.
@@ -216,6 +481,57 @@ class InstanaOTelConnector:
         from unittest.mock import MagicMock
         return MagicMock()
 
+    def _otlp_exporter_kwargs(self):
+        """
+        Build the keyword arguments shared by the OTLP span and metric exporters.
+        
+        Returns:
+            dict: Endpoint, security, compression and TLS certificate settings
+        """
+        if self.use_tls:
+            # Use HTTPS endpoint with TLS
+            otlp_endpoint = f"https://{self.agent_host}:{self.agent_port}"
+            exporter_kwargs = dict(endpoint=otlp_endpoint, insecure=False,
+                                   compression=self._grpc_compression,
+                                   timeout=self.otlp_timeout_millis / 1000)
+            if self.ca_cert_path:
+                exporter_kwargs["ca_file"] = self.ca_cert_path
+            if self.client_cert_path and self.client_key_path:
+                exporter_kwargs["cert_file"] = self.client_cert_path
+                exporter_kwargs["key_file"] = self.client_key_path
+        else:
+            # Use standard non-TLS endpoint
+            otlp_endpoint = f"{self.agent_host}:{self.agent_port}"
+            exporter_kwargs = dict(endpoint=otlp_endpoint, insecure=True,
+                                   compression=self._grpc_compression,
+                                   timeout=self.otlp_timeout_millis / 1000)
+        
+        logger.debug(f"Using {'TLS' if self.use_tls else 'non-TLS'} endpoint: {otlp_endpoint}")
+        return exporter_kwargs
+
+    def _new_exporter(self, exporter_class, exporter_kwargs, channel_options=()):
+        """
+        Create an OTLP exporter whose gRPC channel uses keepalive and any extra options.
+        
+        Exporters too old to accept channel options are created with gRPC defaults.
+        Span and metric exporters built from the same arguments get identical
+        channel arguments, so gRPC carries both over one shared connection.
+        
+        Args:
+            exporter_class: OTLPSpanExporter or OTLPMetricExporter
+            exporter_kwargs: Keyword arguments for the exporter
+            channel_options: Additional gRPC channel options
+            
+        Returns:
+            The exporter instance
+        """
+        if _accepts_channel_options(exporter_class):
+            return exporter_class(
+                channel_options=GRPC_KEEPALIVE_OPTIONS + tuple(channel_options),
+                **exporter_kwargs
+            )
+        return exporter_class(**exporter_kwargs)
+
     def _setup_tracing(self):
         """Set up the OpenTelemetry tracer provider and exporter."""
         if not OPENTELEMETRY_AVAILABLE:
@@ -223,57 +539,37 @@ class InstanaOTelConnector:
             return
             
         try:
-            # Create OTLP exporter for traces
-            if self.use_tls:
-                # Use HTTPS endpoint with TLS
-                protocol = "https://" if self.use_tls else "http://"
-                otlp_endpoint = f"{protocol}{self.agent_host}:{self.agent_port}"
-                logger.debug(f"Using TLS endpoint: {otlp_endpoint}")
-                
-                # Configure TLS options
-                tls_config = {}
-                if self.ca_cert_path:
-                    tls_config["ca_file"] = self.ca_cert_path
-                    logger.debug(f"Using CA certificate: {self.ca_cert_path}")
-                if self.client_cert_path and self.client_key_path:
-                    tls_config["cert_file"] = self.client_cert_path
-                    tls_config["key_file"] = self.client_key_path
-                    logger.debug("Using client certificate for mutual TLS")
-                
+            # Reuse the provider of an earlier connector with the same settings
+            providers = self._providers
+            tracer_provider = providers.get('tracer')
+            if tracer_provider is None:
+                # Create OTLP exporter for traces
                 try:
-                    span_exporter = OTLPSpanExporter(
-                        endpoint=otlp_endpoint,
-                        insecure=False,
-                        credentials=None,
-                        headers=None,
-                        timeout=None,
-                        compression=None,
-                        **tls_config
-                    )
+                    span_exporter = self._new_exporter(OTLPSpanExporter, self._otlp_exporter_kwargs())
                 except ConnectionError as e:
                     span_exporter = self._handle_connection_error(e, "tracing")
                     return
+                
+                # Create and set the tracer provider
+                tracer_provider = TracerProvider(resource=self.resource)
+                span_processor = BatchSpanProcessor(
+                    span_exporter,
+                    max_queue_size=self.bsp_max_queue_size,
+                    schedule_delay_millis=self.bsp_schedule_delay_millis,
+                    max_export_batch_size=self.bsp_max_export_batch_size,
+                    export_timeout_millis=self.bsp_export_timeout_millis
+                )
+                tracer_provider.add_span_processor(span_processor)
+                trace.set_tracer_provider(tracer_provider)
+                providers['tracer'] = tracer_provider
             else:
-                # Use standard non-TLS endpoint
-                otlp_endpoint = f"{self.agent_host}:{self.agent_port}"
-                logger.debug(f"Using non-TLS endpoint: {otlp_endpoint}")
-                try:
-                    span_exporter = OTLPSpanExporter(endpoint=otlp_endpoint, insecure=True)
-                except ConnectionError as e:
-                    span_exporter = self._handle_connection_error(e, "tracing")
-                    return
-            
-            # Create and set the tracer provider
-            tracer_provider = TracerProvider(resource=self.resource)
-            span_processor = BatchSpanProcessor(span_exporter)
-            tracer_provider.add_span_processor(span_processor)
-            trace.set_tracer_provider(tracer_provider)
+                logger.debug(f"Reusing tracer provider for {self.service_name}")
             
             # Store provider for cleanup
             self._tracer_provider = tracer_provider
             
             # Get a tracer
-            self.tracer = trace.get_tracer(
+            self.tracer = tracer_provider.get_tracer(
                 self.service_name,
                 schema_url="https://opentelemetry.io/schemas/1.11.0"
             )
@@ -289,50 +585,32 @@ class InstanaOTelConnector:
             return
             
         try:
-            # Create OTLP exporter for metrics
-            if self.use_tls:
-                # Use HTTPS endpoint with TLS
-                protocol = "https://" if self.use_tls else "http://"
-                otlp_endpoint = f"{protocol}{self.agent_host}:{self.agent_port}"
-                logger.debug(f"Using TLS endpoint for metrics: {otlp_endpoint}")
+            # Reuse the provider of an earlier connector with the same settings
+            providers = self._providers
+            meter_provider = providers.get('meter')
+            if meter_provider is None:
+                # Create OTLP exporter for metrics
+                metric_exporter = self._new_exporter(OTLPMetricExporter, self._otlp_exporter_kwargs())
                 
-                # Configure TLS options
-                tls_config = {}
-                if self.ca_cert_path:
-                    tls_config["ca_file"] = self.ca_cert_path
-                if self.client_cert_path and self.client_key_path:
-                    tls_config["cert_file"] = self.client_cert_path
-                    tls_config["key_file"] = self.client_key_path
-                
-                metric_exporter = OTLPMetricExporter(
-                    endpoint=otlp_endpoint,
-                    insecure=False,
-                    headers=None,
-                    timeout=None,
-                    compression=None,
-                    **tls_config
+                # Create metric reader
+                reader = PeriodicExportingMetricReader(
+                    metric_exporter,
+                    export_interval_millis=self.metric_export_interval_millis,
+                    export_timeout_millis=self.metric_export_timeout_millis
                 )
+                
+                # Create and set meter provider
+                meter_provider = MeterProvider(resource=self.resource, metric_readers=[reader])
+                set_meter_provider(meter_provider)
+                providers['meter'] = meter_provider
             else:
-                # Use standard non-TLS endpoint
-                otlp_endpoint = f"{self.agent_host}:{self.agent_port}"
-                logger.debug(f"Using non-TLS endpoint for metrics: {otlp_endpoint}")
-                metric_exporter = OTLPMetricExporter(endpoint=otlp_endpoint, insecure=True)
-            
-            # Create metric reader
-            reader = PeriodicExportingMetricReader(
-                metric_exporter,
-                export_interval_millis=60000  # Export every 60 seconds
-            )
-            
-            # Create and set meter provider
-            meter_provider = MeterProvider(resource=self.resource, metric_readers=[reader])
-            set_meter_provider(meter_provider)
+                logger.debug(f"Reusing meter provider for {self.service_name}")
             
             # Store provider for cleanup
             self._meter_provider = meter_provider
             
             # Get a meter
-            self.meter = get_meter_provider().get_meter(
+            self.meter = meter_provider.get_meter(
                 self.service_name,
                 schema_url="https://opentelemetry.io/schemas/1.11.0"
             )
@@ -347,7 +625,7 @@ class InstanaOTelConnector:
             
     def _create_metric_callback(self, metric_name, is_percentage=False, is_counter=False, 
                                decimal_places=2, display_name=None):
-        """Create a generator callback function for a specific metric.
+        """Create a callback for a specific metric.
 
         Args:
             metric_name: The name of the metric this callback will observe
@@ -357,33 +635,11 @@ class InstanaOTelConnector:
             display_name: Optional display name for logging
 
         Returns:
-            A generator callback function that yields Observation objects for the observable gauge
+            A _MetricCallback that returns Observation objects for the observable instrument
         """
-        def callback(options):
-            try:
-                if metric_name in self._metrics_state:
-                    raw_value = self._metrics_state[metric_name]
-                    
-                    # Format the value according to manifest.toml specifications
-                    if is_percentage:
-                        # Convert percentage values (e.g., 25.5% or 250% for multi-core CPU) to decimal form
-                        value = round(float(raw_value) / 100.0, decimal_places)
-                    elif is_counter or decimal_places == 0:
-                        # For counters and metrics with 0 decimals, show as integers
-                        value = int(float(raw_value))
-                    else:
-                        # For other metrics, use the decimal places from manifest.toml
-                        value = round(float(raw_value), decimal_places)
-                    
-                    # Yield an Observation object as required by OpenTelemetry API
-                    yield Observation(value)
-                    
-                    # Use the provided display name or the metric name for logging
-                    log_name = display_name or metric_name
-                    logger.debug(f"Observed metric {log_name}={value}")
-            except Exception as e:
-                logger.error(f"Error in metric callback for {metric_name}: {e}")
-        return callback
+        return _MetricCallback(self._metrics_state, metric_name, is_percentage=is_percentage,
+                               is_counter=is_counter, decimal_places=decimal_places,
+                               display_name=display_name)
     
     def create_observable(self, name, otel_type, unit=None, decimals=2, is_percentage=False, 
                          is_counter=False, description=None, pattern_type=None, 
@@ -411,6 +667,12 @@ class InstanaOTelConnector:
             logger.error(f"Cannot create observable metric {name}: Meter not initialized")
             return None
             
+        # Each metric gets one instrument; a second one would duplicate its callback
+        existing = self._observables.get(name)
+        if existing is not None:
+            return existing
+        
+
         # Convert TOML otel_type to OpenTelemetry method name
         if otel_type == "UpDownCounter":
             # Handle the special case for UpDownCounter
@@ -439,13 +701,15 @@ class InstanaOTelConnector:
         # Log creation with TOML type
         logger.debug(f"Creating observable {otel_type} metric: {name} -> {simple_name}")
         
-        # Create and return the metric using the dynamically obtained method
-        return create_method(
+        # Create, cache and return the metric using the dynamically obtained method
+        observable = create_method(
             name=simple_name,
             description=description or f"Metric for {name}",
             unit=unit or ("%" if is_percentage else ""),
             callbacks=[callback]
         )
+        self._observables[name] = observable
+        return observable
     
     def _sync_toml_to_database(self):
         """
@@ -461,25 +725,9 @@ class InstanaOTelConnector:
             metric_definitions = get_expanded_metrics()
             logger.info(f"Syncing {len(metric_definitions)} TOML metric definitions to database")
             
-            # Sync each metric definition to database
-            for metric_def in metric_definitions:
-                name = metric_def['name']
-                
-                # Sync metric to database with all TOML parameters
-                metric_id, display_name = self._metadata_store.sync_metric_from_toml(
-                    service_id=self.service_id,
-                    name=name,
-                    unit=metric_def.get('unit', ""),
-                    otel_type=metric_def.get('otel_type', 'Gauge'),
-                    decimals=metric_def.get('decimals', 2),
-                    is_percentage=metric_def.get('is_percentage', False),
-                    is_counter=metric_def.get('is_counter', False),
-                    description=metric_def.get('description', f"Metric for {name}"),
-                    pattern_type=metric_def.get('pattern_type'),
-                    pattern_source=metric_def.get('pattern_source'),
-                    pattern_range=metric_def.get('pattern_range')
-                )
-                
+            # Sync all metric definitions to database in a single transaction
+            self._metadata_store.sync_metrics_from_toml_batch(self.service_id, metric_definitions)
+
             # Remove metrics from database that are no longer in TOML
             current_metric_names = {metric_def['name'] for metric_def in metric_definitions}
             self._metadata_store.remove_obsolete_metrics(self.service_id, current_metric_names)
@@ -510,42 +758,48 @@ class InstanaOTelConnector:
             database_metrics = self._metadata_store.get_service_metrics(self.service_id)
             logger.info(f"Loaded {len(database_metrics)} metrics from database registry")
             
-            # Step 3: Register metrics with OpenTelemetry using database definitions
+            # Step 3: Accept the database definitions; each OpenTelemetry instrument is
+            # created on the metric's first recorded value (see _create_pending_observables)
             for metric_record in database_metrics:
-                try:
-                    metric_name = metric_record['name']
-                    otel_type = metric_record['otel_type']
-                    unit = metric_record['unit']
-                    decimals = metric_record['decimal_places']
-                    is_percentage = metric_record['is_percentage']
-                    is_counter = metric_record['is_counter']
-                    description = metric_record['description']
-                    display_name = metric_record['display_name']
-                    
-                    # Create the observable metric using database configuration
-                    metric = self.create_observable(
-                        name=metric_name,
-                        otel_type=otel_type,
-                        unit=unit,
-                        decimals=decimals,
-                        is_percentage=is_percentage,
-                        is_counter=is_counter,
-                        description=description,
-                        display_name=display_name
-                    )
-                    
-                    # Add to registry for tracking
-                    self._metrics_registry.add(metric_name)
-                    logger.debug(f"Registered observable metric from database: {metric_name} ({otel_type})")
-                    
-                except Exception as e:
-                    logger.error(f"Error registering metric {metric_record.get('name', 'unknown')}: {e}")
-                    continue
+                metric_name = metric_record['name']
+                self._pending_observables[metric_name] = metric_record
+                self._metrics_registry.add(metric_name)
             
-            logger.info(f"Registered {len(self._metrics_registry)} observable metrics from database for {self.service_name}")
+            logger.info(f"Registered {len(self._metrics_registry)} metrics from database for {self.service_name}")
         except Exception as e:
             logger.error(f"Error registering observable metrics: {e}")
         
+    def _create_pending_observables(self):
+        """
+        Create the observable instruments for registered metrics that now have a value.
+        
+        Metrics a plugin never reports are never turned into instruments, so they
+        add no SDK state and no callback to each export. A metric stays pending,
+        and is retried on the next recorded value, until its instrument exists.
+        """
+        for metric_name in self._pending_observables.keys() & self._metrics_state.keys():
+            metric_record = self._pending_observables[metric_name]
+            try:
+                otel_type = metric_record['otel_type']
+                
+                # Create the observable metric using database configuration
+                observable = self.create_observable(
+                    name=metric_name,
+                    otel_type=otel_type,
+                    unit=metric_record['unit'],
+                    decimals=metric_record['decimal_places'],
+                    is_percentage=metric_record['is_percentage'],
+                    is_counter=metric_record['is_counter'],
+                    description=metric_record['description'],
+                    display_name=metric_record['display_name']
+                )
+                if observable is None:
+                    continue
+                del self._pending_observables[metric_name]
+                logger.debug(f"Registered observable metric from database: {metric_name} ({otel_type})")
+            except Exception as e:
+                logger.error(f"Error registering metric {metric_name}: {e}")
+        
     def record_metrics(self, metrics: Dict[str, Any]):
         """
         Update the metrics state with new values.
@@ -564,36 +818,51 @@ class InstanaOTelConnector:
             
         try:
             # Update the metrics state dictionary with new values
-            metrics_updated = 0
             metrics_rejected = 0
+            registry = self._metrics_registry
+            state = self._metrics_state
+            # Only format per-metric debug messages when they will be emitted
+            debug = logger.isEnabledFor(logging.DEBUG)
+            
+            # Registered int/float values - the common case - are stored in one update;
+            # the raw value is kept, formatting happens in the callback
+            numeric = {name: value for name, value in metrics.items()
+                       if type(value) in (int, float) and name in registry}
+            state.update(numeric)
+            metrics_updated = len(numeric)
+            if debug:
+                for name, value in numeric.items():
+                    logger.debug(f"Updated metric state {name}={value}")
             
-            for name, value in metrics.items():
-                # Only process metrics that are registered (defined in TOML)
-                if name not in self._metrics_registry:
-                    logger.warning(f"Metric '{name}' not defined in TOML configuration, rejecting")
-                    metrics_rejected += 1
-                    continue
+            if metrics_updated < len(metrics):
+                for name, value in metrics.items():
+                    if name in numeric:
+                        continue
                     
-                if isinstance(value, (int, float)):
-                    # Store the raw value - formatting happens in the callback
-                    self._metrics_state[name] = value
-                    metrics_updated += 1
-                    logger.debug(f"Updated metric state {name}={value}")
-                elif isinstance(value, str):
-                    # Try to convert string numbers (handles both integers and decimals)
+                    # Only process metrics that are registered (defined in TOML)
+                    if name not in registry:
+                        logger.warning(f"Metric '{name}' not defined in TOML configuration, rejecting")
+                        metrics_rejected += 1
+                        continue
+                    
+                    # Convert anything float() accepts: numeric strings in any
+                    # notation, Decimal, numpy scalars and the like
                     try:
-                        numeric_value = float(value)
-                        self._metrics_state[name] = numeric_value
-                        metrics_updated += 1
-                        logger.debug(f"Updated metric state {name}={value} (converted from string)")
-                    except ValueError:
-                        # Skip non-numeric string values
-                        logger.debug(f"Skipping non-numeric string metric: {name}={value}")
-                else:
-                    # Skip non-numeric metrics
-                    logger.debug(f"Skipping non-numeric metric: {name}={value}")
-            
-            logger.debug(f"Updated {metrics_updated} metrics, rejected {metrics_rejected} undefined metrics for {self.service_name}")
+                        state[name] = float(value)
+                    except (TypeError, ValueError):
+                        # Skip non-numeric values
+                        if debug:
+                            logger.debug(f"Skipping non-numeric metric: {name}={value!r}")
+                        continue
+                    metrics_updated += 1
+                    if debug:
+                        logger.debug(f"Updated metric state {name}={value} (converted)")
+            
+            if self._pending_observables:
+                self._create_pending_observables()
+            
+            if debug:
+                logger.debug(f"Updated {metrics_updated} metrics, rejected {metrics_rejected} undefined metrics for {self.service_name}")
         except Exception as e:
             logger.error(f"Error recording metrics: {e}")
             
@@ -607,19 +876,14 @@ class InstanaOTelConnector:
             attributes: Span attributes
             
         Returns:
-            An OpenTelemetry span or a dummy context manager if OpenTelemetry is not available
+            An OpenTelemetry span or a no-op context manager if OpenTelemetry is not available
         """
         if not OPENTELEMETRY_AVAILABLE:
             logger.error(f"Cannot create span '{name}': OpenTelemetry packages not installed")
-            # Return a dummy context manager
-            class DummyContextManager:
-                def __enter__(self):
-                    return self
-                def __exit__(self, exc_type, exc_val, exc_tb):
-                    pass
-            return DummyContextManager()
-            
-        logger.debug(f"Creating span: {name}")
+            # Return the shared no-op context manager
+            return _NULL_SPAN
+            
+        logger.debug("Creating span: %s", name)
         return self.tracer.start_as_current_span(name, attributes=attributes)
         
     def shutdown(self):
@@ -630,11 +894,17 @@ class InstanaOTelConnector:
         try:
             # Force flush any pending spans
             if hasattr(self, '_tracer_provider'):
-                self._tracer_provider.force_flush()
+                self._tracer_provider.force_flush(timeout_millis=SHUTDOWN_FLUSH_TIMEOUT_MILLIS)
                 
             # Force flush any pending metrics
             if hasattr(self, '_meter_provider'):
-                self._meter_provider.force_flush()
+                self._meter_provider.force_flush(timeout_millis=SHUTDOWN_FLUSH_TIMEOUT_MILLIS)
+                
+            # Stop the shared providers once their last connector shuts down
+            self._release_providers()
+                
+            # Release the metadata store's database connections
+            self._metadata_store.close()
                 
             logger.info(f"Successfully shut down OTel connector for {self.service_name}")
         except Exception as e:
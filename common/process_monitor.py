@@ -16,7 +16,7 @@ import json
 import logging
 import multiprocessing
 import platform
-from datetime import datetime
+import time
 from typing import Dict, Any, Optional, List
 
 import psutil
@@ -363,7 +363,7 @@ def report_metrics(process_name, plugin_name, agent_host="localhost", agent_port
             output = {
                 "name": plugin_name,
                 "entityId": f"{process_name.lower()}-" + platform.node(),
-                "timestamp": int(datetime.now().timestamp() * 1000),
+                "timestamp": int(time.time() * 1000),
                 "metrics": metrics
             }
             
@@ -378,7 +378,7 @@ def report_metrics(process_name, plugin_name, agent_host="localhost", agent_port
         output = {
             "name": plugin_name,
             "entityId": f"{process_name.lower()}-" + platform.node(),
-            "timestamp": int(datetime.now().timestamp() * 1000),
+            "timestamp": int(time.time() * 1000),
             "metrics": metrics
         }
         print(json.dumps(output), flush=True)
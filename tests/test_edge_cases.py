@@ -17,9 +17,12 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 # Import modules to test
 from common.process_monitor import get_process_metrics, get_disk_io_for_pid
-from common.otel_connector import InstanaOTelConnector
+from common.otel_connector import InstanaOTelConnector, _load_opentelemetry
 from common.logging_config import setup_logging
 
+# Bind the OpenTelemetry names now so individual tests can patch them
+_load_opentelemetry()
+
 class TestEdgeCases(unittest.TestCase):
     """Test cases for edge cases and limitations."""
     
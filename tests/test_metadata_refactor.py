@@ -105,6 +105,144 @@ class TestMetadataRefactor(unittest.TestCase):
         self.assertIn("last_seen", param_order)
         self.assertIn("id", param_order)  # For WHERE clause
     
+    def test_build_metrics_query_upsert(self):
+        """Test _build_metrics_query for upsert with and without otel_type."""
+        store = MetadataStore(self.db_path)
+        sql, param_order = store._build_metrics_query('upsert', True)
+
+        # Upsert reuses the insert parameters and refreshes the existing row
+        _, insert_order = store._build_metrics_query('insert', True)
+        self.assertEqual(insert_order, param_order)
+        self.assertIn("ON CONFLICT(service_id, name) DO UPDATE", sql)
+        self.assertIn("otel_type = excluded.otel_type", sql)
+        self.assertIn("last_seen = excluded.last_seen", sql)
+        self.assertNotIn("first_seen = excluded.first_seen", sql)
+        self.assertIn("RETURNING id, display_name", sql)
+
+        sql, param_order = store._build_metrics_query('upsert', False)
+        self.assertNotIn("otel_type", sql)
+        self.assertNotIn("otel_type", param_order)
+
+    def test_schema_derived_state(self):
+        """Test otel_type detection and the upsert statement follow the cached schema."""
+        store = MetadataStore(self.db_path)
+        self.assertTrue(store._include_otel_type)
+        self.assertEqual(store._build_metrics_query('upsert', True)[0], store._upsert_metric_sql)
+        self.assertIn("COALESCE(otel_type, 'Gauge') AS otel_type", store._service_metrics_sql)
+
+        store._set_metrics_columns({'id', 'service_id', 'name', 'display_name'})
+        self.assertFalse(store._include_otel_type)
+        self.assertEqual(store._build_metrics_query('upsert', False)[0], store._upsert_metric_sql)
+        self.assertIn("'Gauge' AS otel_type", store._service_metrics_sql)
+        self.assertNotIn("COALESCE(otel_type", store._service_metrics_sql)
+
+    def test_get_or_create_metric_without_otel_column(self):
+        """Test the upsert binds its values correctly for schemas without otel_type."""
+        store = MetadataStore(self.db_path)
+        service_id, _ = store.get_or_create_service("com.instana.plugin.python.test_v1_upsert")
+        store._set_metrics_columns(store.metrics_columns - {'otel_type'})
+
+        metric_id, display_name = store.get_or_create_metric(
+            service_id, "disk_read_bytes", unit="bytes", decimal_places=0, is_counter=True
+        )
+
+        info = store.get_metric_info(service_id, "disk_read_bytes")
+        self.assertEqual(metric_id, info.id)
+        self.assertEqual("Disk Read Bytes", display_name)
+        self.assertEqual("bytes", info.unit)
+        self.assertEqual(0, info.decimal_places)
+
+    def test_upserts_without_returning_support(self):
+        """Test upserts read the row back with a SELECT on SQLite older than 3.35."""
+        import importlib
+        import common.metadata_store as metadata_store
+
+        try:
+            with patch.object(sqlite3, 'sqlite_version_info', (3, 31, 1)):
+                importlib.reload(metadata_store)
+            self.assertFalse(metadata_store.SQLITE_HAS_RETURNING)
+            self.assertNotIn("RETURNING", metadata_store._UPSERT_SERVICE_SQL)
+
+            store = metadata_store.MetadataStore(self.db_path)
+            self.assertNotIn("RETURNING", store._upsert_metric_sql)
+            service_id, _ = store.get_or_create_service(
+                "com.instana.plugin.python.test_no_returning", hostname="host-a", service_namespace="Test"
+            )
+            metric_id, display_name = store.get_or_create_metric(service_id, "cpu_usage")
+            store._clear_lookup_caches()
+
+            self.assertEqual((service_id, "Test No Returning"),
+                             store.get_or_create_service("com.instana.plugin.python.test_no_returning",
+                                                         hostname="host-a", service_namespace="Test"))
+            self.assertEqual((metric_id, "CPU Usage"), store.get_or_create_metric(service_id, "cpu_usage"))
+            self.assertEqual(store.get_or_create_host("host-a"), store.get_or_create_host("host-a"))
+            store.close()
+        finally:
+            importlib.reload(metadata_store)
+
+    def test_upserts_without_upsert_support(self):
+        """Test hosts, namespaces and services are written without UPSERT on SQLite older than 3.24."""
+        store = MetadataStore(self.db_path)
+
+        with patch('common.metadata_store.SQLITE_HAS_UPSERT', False):
+            service_id, display_name = store.get_or_create_service(
+                "com.instana.plugin.python.test_no_upsert", version="1.0",
+                hostname="host-a", service_namespace="Test"
+            )
+            store._clear_lookup_caches()
+            self.assertEqual((service_id, display_name),
+                             store.get_or_create_service("com.instana.plugin.python.test_no_upsert",
+                                                         hostname="host-a", service_namespace="Test"))
+            self.assertEqual(store.get_or_create_host("host-a"), store.get_or_create_host("host-a"))
+            self.assertEqual(store.get_or_create_service_namespace("Test"),
+                             store.get_or_create_service_namespace("Test"))
+
+        self.assertEqual("1.0", store.get_service_info(service_id)['version'])
+        with store._get_db_connection() as conn:
+            self.assertEqual(1, conn.execute("SELECT COUNT(*) FROM hosts").fetchone()[0])
+            self.assertEqual(1, conn.execute("SELECT COUNT(*) FROM service_namespaces").fetchone()[0])
+        store.close()
+
+    def test_metric_upserts_without_upsert_support(self):
+        """Test metrics are written with SELECT/UPDATE/INSERT on SQLite older than 3.24."""
+        store = MetadataStore(self.db_path)
+        service_id, _ = store.get_or_create_service("com.instana.plugin.python.test_no_upsert")
+
+        with patch('common.metadata_store.SQLITE_HAS_UPSERT', False):
+            metric_id, display_name = store.get_or_create_metric(service_id, "cpu_usage", unit="%")
+            store._clear_lookup_caches()
+            self.assertEqual((metric_id, "CPU Usage"),
+                             store.get_or_create_metric(service_id, "cpu_usage", unit="percent"))
+            self.assertEqual("percent", store.get_metric_info(service_id, "cpu_usage").unit)
+            synced = store.sync_metrics_from_toml_batch(
+                service_id, [{'name': "cpu_usage"}, {'name': "disk_read_bytes", 'is_counter': True}]
+            )
+
+        self.assertEqual("CPU Usage", display_name)
+        self.assertEqual((metric_id, "CPU Usage"), synced["cpu_usage"])
+        self.assertEqual(store.get_metric_info(service_id, "disk_read_bytes").id, synced["disk_read_bytes"][0])
+        store.close()
+
+    def test_logging_configured_once(self):
+        """Test logging is configured by the first store instead of at import."""
+        with patch('common.metadata_store._LOGGING_CONFIGURED', False), \
+             patch('common.metadata_store.setup_logging') as setup_mock:
+            MetadataStore(self.db_path).close()
+            MetadataStore(self.db_path).close()
+        setup_mock.assert_called_once_with()
+
+    def test_get_or_create_metric_updates_existing(self):
+        """Test get_or_create_metric keeps the ID and refreshes an existing metric."""
+        store = MetadataStore(self.db_path)
+        service_id, _ = store.get_or_create_service("com.instana.plugin.python.test_upsert")
+
+        metric_id, _ = store.get_or_create_metric(service_id, "thread_count", unit="threads")
+        metric_id2, display_name = store.get_or_create_metric(service_id, "thread_count", unit="count")
+
+        self.assertEqual(metric_id, metric_id2)
+        self.assertEqual("Thread Count", display_name)
+        self.assertEqual("count", store.get_metric_info(service_id, "thread_count").unit)
+
     def test_get_or_create_metric_with_otel_type(self):
         """Test _build_metrics_query includes otel_type for insert and update."""
         # Create a store with a mocked metrics_columns that includes otel_type
@@ -12,6 +12,8 @@ import sys
 import unittest
 import tempfile
 import shutil
+import sqlite3
+import time
 import re
 from unittest.mock import patch
 
@@ -19,7 +21,7 @@ from unittest.mock import patch
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from common.version import get_version
-from common.metadata_store import MetadataStore
+from common.metadata_store import MetadataStore, LOOKUP_CACHE_REFRESH_INTERVAL, WAL_CHECKPOINT_INTERVAL, _make_formatter
 
 # Get the version from the new version system
 VERSION = get_version()
@@ -71,6 +73,36 @@ class TestMetadataStore(unittest.TestCase):
         self.assertEqual(VERSION, service_info['version'])
         self.assertEqual(description, service_info['description'])
     
+    def test_service_upsert_updates_existing(self):
+        """Test re-registering a service keeps its ID and only overrides supplied values"""
+        host_id = self.store.get_or_create_host("host-a")
+        self.assertEqual(host_id, self.store.get_or_create_host("host-a"))
+        namespace_id = self.store.get_or_create_service_namespace("MicroStrategy")
+        self.assertEqual(namespace_id, self.store.get_or_create_service_namespace("MicroStrategy"))
+        self.assertRegex(namespace_id, r'^[0-9a-f]{32}$')
+
+        service_name = "com.instana.plugin.python.test_upsert"
+        service_id, _ = self.store.get_or_create_service(service_name, version="1.0", description="First")
+        service_id2, _ = self.store.get_or_create_service(service_name, version="2.0", hostname="host-a")
+
+        self.assertEqual(service_id, service_id2)
+        service_info = self.store.get_service_info(service_id)
+        self.assertEqual("2.0", service_info['version'])
+        self.assertEqual("First", service_info['description'])
+
+    def test_service_links_host_and_namespace(self):
+        """Test a service registers its host and namespace alongside the service row"""
+        service_id, _ = self.store.get_or_create_service(
+            "com.instana.plugin.python.test_links", hostname="host-b", service_namespace="MicroStrategy"
+        )
+
+        with self.store._get_db_connection() as conn:
+            host_id, namespace_id = conn.execute(
+                "SELECT host_id, namespace_id FROM services WHERE id = ?", (service_id,)
+            ).fetchone()
+        self.assertEqual(host_id, self.store.get_or_create_host("host-b"))
+        self.assertEqual(namespace_id, self.store.get_or_create_service_namespace("MicroStrategy"))
+
     def test_metrics_for_service(self):
         """Test retrieving all metrics for a service"""
         # Create a service
@@ -106,10 +138,203 @@ class TestMetadataStore(unittest.TestCase):
         self.assertEqual(len(metrics_to_create), len(metrics))
         
         # Verify each metric has the expected fields
-        metric_names = [m['name'] for m in metrics]
+        metric_names = [m.name for m in metrics]
         for name, _, _, _, _ in metrics_to_create:
             self.assertIn(name, metric_names)
+        
+        # Records carry is_percentage as a bool
+        by_name = {m.name: m for m in metrics}
+        for name, _, _, _, is_percentage in metrics_to_create:
+            self.assertIs(is_percentage, by_name[name].is_percentage)
     
+    def test_sync_metrics_from_toml_batch(self):
+        """Test syncing several TOML metric definitions in one transaction"""
+        service_id, _ = self.store.get_or_create_service("com.instana.plugin.python.test_batch")
+        metric_definitions = [
+            {"name": "cpu_usage", "unit": "%", "is_percentage": True, "decimals": 2},
+            {"name": "disk_read_bytes", "unit": "bytes", "is_counter": True, "otel_type": "Counter"},
+            {"name": "thread_count", "unit": "threads", "decimals": 0}
+        ]
+
+        synced = self.store.sync_metrics_from_toml_batch(service_id, metric_definitions)
+        self.assertEqual({"cpu_usage", "disk_read_bytes", "thread_count"}, set(synced))
+        self.assertEqual("CPU Usage", synced["cpu_usage"][1])
+        # Metric IDs are compact hex UUIDs; the service ID keeps the canonical form
+        self.assertRegex(synced["cpu_usage"][0], r'^[0-9a-f]{32}$')
+        self.assertEqual(36, len(service_id))
+
+        metrics = {m['name']: m for m in self.store.get_service_metrics(service_id)}
+        self.assertEqual("percentage", metrics["cpu_usage"]['format_type'])
+        self.assertEqual("counter", metrics["disk_read_bytes"]['format_type'])
+        self.assertEqual("Counter", metrics["disk_read_bytes"]['otel_type'])
+        self.assertEqual("number", metrics["thread_count"]['format_type'])
+        self.assertEqual("Metric for thread_count", metrics["thread_count"]['description'])
+        self.assertTrue(metrics["cpu_usage"]['is_percentage'])
+        self.assertFalse(metrics["thread_count"]['is_counter'])
+
+        # Re-syncing keeps the existing IDs
+        resynced = self.store.sync_metrics_from_toml_batch(service_id, metric_definitions)
+        self.assertEqual(synced, resynced)
+
+        # Only the requested metrics are returned, and updates are applied
+        self.store.get_or_create_metric(service_id, "legacy_metric")
+        partial = self.store.sync_metrics_from_toml_batch(
+            service_id, [{"name": "thread_count", "unit": "count", "decimals": 0}]
+        )
+        self.assertEqual({"thread_count": synced["thread_count"]}, partial)
+        self.assertEqual("count", self.store.get_metric_info(service_id, "thread_count").unit)
+
+    def test_sync_metric_from_toml_format_type(self):
+        """Test the format type derived from TOML percentage/counter flags"""
+        service_id, _ = self.store.get_or_create_service("com.instana.plugin.python.test_format_type")
+        flags = {
+            "plain_metric": (False, False, "number"),
+            "percent_metric": (True, False, "percentage"),
+            "counter_metric": (False, True, "counter"),
+            "percent_counter_metric": (True, True, "counter"),
+        }
+        for name, (is_percentage, is_counter, _) in flags.items():
+            self.store.sync_metric_from_toml(
+                service_id, name, is_percentage=is_percentage, is_counter=is_counter
+            )
+
+        for name, (_, _, expected) in flags.items():
+            self.assertEqual(expected, self.store.get_metric_info(service_id, name).format_type)
+
+    def test_service_metrics_default_otel_type(self):
+        """Test that metrics without a stored otel_type are reported as Gauge"""
+        service_id, _ = self.store.get_or_create_service("com.instana.plugin.python.test_otel_default")
+        self.store.get_or_create_metric(service_id=service_id, name="thread_count")
+
+        with self.store._get_db_connection() as conn:
+            conn.execute("UPDATE metrics SET otel_type = NULL WHERE service_id = ?", (service_id,))
+
+        metrics = self.store.get_service_metrics(service_id)
+        self.assertEqual(["Gauge"], [m['otel_type'] for m in metrics])
+
+    def test_lookup_cache(self):
+        """Test repeated service and metric lookups are answered without the database"""
+        service_id, _ = self.store.get_or_create_service("com.instana.plugin.python.test_cache")
+        metric_id, _ = self.store.get_or_create_metric(service_id, "thread_count")
+
+        with patch.object(self.store, '_get_db_connection', side_effect=AssertionError("database used")):
+            self.assertEqual(service_id, self.store.get_or_create_service("com.instana.plugin.python.test_cache")[0])
+            self.assertEqual((metric_id, "Thread Count"), self.store.get_or_create_metric(service_id, "thread_count"))
+
+        # Expired entries go back to the database and keep the same IDs
+        for cache in (self.store._service_cache, self.store._metric_cache):
+            for key, entry in cache.items():
+                cache[key] = entry[:2] + (entry[2] - LOOKUP_CACHE_REFRESH_INTERVAL,)
+        with patch.object(self.store, '_get_db_connection', wraps=self.store._get_db_connection) as conn_mock:
+            self.assertEqual(service_id, self.store.get_or_create_service("com.instana.plugin.python.test_cache")[0])
+            self.assertEqual(metric_id, self.store.get_or_create_metric(service_id, "thread_count")[0])
+            self.assertEqual(2, conn_mock.call_count)
+
+        # Removed metrics are dropped from the cache and recreated on the next call
+        self.store.remove_obsolete_metrics(service_id, set())
+        self.assertNotEqual(metric_id, self.store.get_or_create_metric(service_id, "thread_count")[0])
+
+    def test_fallback_ids_are_stable(self):
+        """Test IDs handed out while the database is unavailable stay the same per name"""
+        service_name = "com.instana.plugin.python.test_outage"
+        with patch.object(self.store, '_get_db_connection', side_effect=sqlite3.OperationalError("disk I/O error")):
+            service_id, display_name = self.store.get_or_create_service(service_name)
+            self.assertEqual((service_id, display_name), self.store.get_or_create_service(service_name))
+            self.assertEqual("Test Outage", display_name)
+
+            metric = self.store.get_or_create_metric(service_id, "thread_count")
+            self.assertEqual(metric, self.store.get_or_create_metric(service_id, "thread_count"))
+            synced = self.store.sync_metrics_from_toml_batch(service_id, [{"name": "thread_count"}])
+            self.assertEqual({"thread_count": metric}, synced)
+
+    def test_lookup_stats(self):
+        """Test lookup cache hits, misses and upserts are counted"""
+        service_id, _ = self.store.get_or_create_service("com.instana.plugin.python.test_stats")
+        for _ in range(3):
+            self.store.get_or_create_metric(service_id, "thread_count")
+        self.store.close()
+
+        stats = self.store.stats()
+        self.assertEqual(2, stats['lookup_cache_hits'])
+        self.assertEqual(2, stats['lookup_cache_misses'])
+        self.assertEqual(2, stats['db_upserts'])
+        self.assertGreater(stats['db_upsert_seconds'], 0)
+        self.assertEqual(1, stats['last_seen_flushes'])
+        self.assertEqual(0.5, stats['lookup_cache_hit_ratio'])
+
+    def test_last_seen_batched_for_cache_hits(self):
+        """Test cache hits refresh last_seen through one batched write"""
+        service_id, _ = self.store.get_or_create_service("com.instana.plugin.python.test_touch")
+        metric_id, _ = self.store.get_or_create_metric(service_id, "thread_count")
+        with self.store._get_db_connection() as conn:
+            conn.execute("UPDATE services SET last_seen = 'stale'")
+            conn.execute("UPDATE metrics SET last_seen = 'stale'")
+
+        self.store.get_or_create_service("com.instana.plugin.python.test_touch")
+        self.store.get_or_create_metric(service_id, "thread_count")
+        self.assertEqual({('services', service_id), ('metrics', metric_id)}, set(self.store._pending_touches))
+
+        self.store.close()
+        self.assertEqual({}, self.store._pending_touches)
+        with self.store._get_db_connection() as conn:
+            for table in ("services", "metrics"):
+                last_seen = conn.execute(f"SELECT last_seen FROM {table}").fetchone()[0]
+                self.assertNotEqual("stale", last_seen)
+
+    def test_last_seen_flushed_by_timer(self):
+        """Test pending last_seen refreshes are written even if no further lookups happen"""
+        service_id, _ = self.store.get_or_create_service("com.instana.plugin.python.test_timer")
+        with self.store._get_db_connection() as conn:
+            conn.execute("UPDATE services SET last_seen = 'stale'")
+
+        with patch('common.metadata_store.LAST_SEEN_FLUSH_INTERVAL', 0.1):
+            self.store._last_touch_flush = time.time()
+            self.store.get_or_create_service("com.instana.plugin.python.test_timer")
+            timer = self.store._flush_timer
+            self.assertIsNotNone(timer)
+            timer.join(5)
+
+        self.assertEqual({}, self.store._pending_touches)
+        self.assertIsNone(self.store._flush_timer)
+        self.assertNotIn(timer, self.store._connections)
+        with self.store._get_db_connection() as conn:
+            last_seen = conn.execute("SELECT last_seen FROM services WHERE id = ?", (service_id,)).fetchone()[0]
+        self.assertNotEqual("stale", last_seen)
+        self.store.close()
+
+    def test_last_seen_flush_checkpoints_wal(self):
+        """Test flushing last_seen truncates the WAL at most once per interval"""
+        wal_path = self.db_path + "-wal"
+        service_id, _ = self.store.get_or_create_service("com.instana.plugin.python.test_wal")
+        self.store.get_or_create_service("com.instana.plugin.python.test_wal")
+        self.assertGreater(os.path.getsize(wal_path), 0)
+
+        # Not due yet: the log is left alone
+        self.store._flush_last_seen()
+        self.assertGreater(os.path.getsize(wal_path), 0)
+
+        self.store._touch_last_seen('services', service_id)
+        self.store._last_wal_checkpoint -= WAL_CHECKPOINT_INTERVAL
+        self.store._flush_last_seen()
+        self.assertEqual(0, os.path.getsize(wal_path))
+        self.store.close()
+
+    def test_remove_obsolete_metrics(self):
+        """Test removing metrics that are no longer defined in TOML"""
+        service_id, _ = self.store.get_or_create_service("com.instana.plugin.python.test_cleanup")
+
+        for name in ("cpu_usage", "memory_usage", "thread_count", "legacy_metric"):
+            self.store.get_or_create_metric(service_id=service_id, name=name)
+
+        removed = self.store.remove_obsolete_metrics(service_id, {"cpu_usage", "memory_usage"})
+        self.assertEqual(2, removed)
+
+        remaining = {m.name for m in self.store.get_metrics_for_service(service_id)}
+        self.assertEqual({"cpu_usage", "memory_usage"}, remaining)
+
+        # Nothing left to remove on a second pass
+        self.assertEqual(0, self.store.remove_obsolete_metrics(service_id, {"cpu_usage", "memory_usage"}))
+
     def test_metric_creation(self):
         """Test creating metrics and retrieving their details"""
         # Create a service first
@@ -134,12 +359,12 @@ class TestMetadataStore(unittest.TestCase):
         # Get the metric info
         metric_info = self.store.get_metric_info(service_id, metric_name)
         self.assertIsNotNone(metric_info)
-        self.assertEqual(metric_id, metric_info['id'])
-        self.assertEqual(display_name, metric_info['display_name'])
-        self.assertEqual("%", metric_info['unit'])
-        self.assertEqual("percentage", metric_info['format_type'])
-        self.assertEqual(2, metric_info['decimal_places'])
-        self.assertTrue(metric_info['is_percentage'])
+        self.assertEqual(metric_id, metric_info.id)
+        self.assertEqual(display_name, metric_info.display_name)
+        self.assertEqual("%", metric_info.unit)
+        self.assertEqual("percentage", metric_info.format_type)
+        self.assertEqual(2, metric_info.decimal_places)
+        self.assertTrue(metric_info.is_percentage)
         
         # Create a CPU core metric to test special formatting
         core_metric_name = "cpu_core_1"
@@ -162,13 +387,45 @@ class TestMetadataStore(unittest.TestCase):
             ("thread_count", "Thread Count"),
             ("cpu_core_0", "CPU Core 0"),
             ("cpu_core_15", "CPU Core 15"),
-            ("voluntary_ctx_switches", "Voluntary Ctx Switches")
+            ("voluntary_ctx_switches", "Voluntary Ctx Switches"),
+            ("process.cpu_time", "Process CPU Time"),
+            ("m8mulprc_io_read-bytes", "M8mulprc Io Read-bytes")
         ]
         
         for input_name, expected_output in test_cases:
             result = self.store._format_metric_name(input_name)
             self.assertEqual(expected_output, result)
     
+    def test_name_helpers_are_memoized(self):
+        """Test that repeated name formatting is served from the cache"""
+        from common.metadata_store import _format_metric_name, _service_display_name, _simple_metric_name
+
+        _format_metric_name.cache_clear()
+        _service_display_name.cache_clear()
+        _simple_metric_name.cache_clear()
+        for _ in range(3):
+            self.assertEqual("CPU Core 1", self.store._format_metric_name("cpu_core_1"))
+            self.assertEqual("M8mulprc", self.store._extract_service_display_name("com.instana.plugin.python.m8mulprc"))
+            self.assertEqual("cpu_usage", self.store.get_simple_metric_name("CPU-Usage"))
+
+        self.assertEqual(2, _format_metric_name.cache_info().hits)
+        self.assertEqual(2, _service_display_name.cache_info().hits)
+        self.assertEqual(2, _simple_metric_name.cache_info().hits)
+
+    def test_current_timestamp_reused_within_second(self):
+        """Test the stored timestamp string is only rebuilt when the second changes"""
+        from common.metadata_store import _current_timestamp
+
+        with patch('common.metadata_store.time.time', return_value=1700000000.2):
+            first = _current_timestamp()
+        with patch('common.metadata_store.time.time', return_value=1700000000.9):
+            self.assertIs(first, _current_timestamp())
+        with patch('common.metadata_store.time.time', return_value=1700000001.0):
+            later = _current_timestamp()
+
+        self.assertRegex(first, r'^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}$')
+        self.assertLess(first, later)
+
     def test_extract_service_display_name(self):
         """Test extracting display names from service full names"""
         test_cases = [
@@ -205,5 +462,14 @@ class TestMetadataStore(unittest.TestCase):
         # Test counter with percentage (percentage conversion happens first, then integer conversion)
         self.assertEqual(75, self.store.format_metric_value(0.753, is_percentage=True, is_counter=True))
 
+    def test_value_formatters_are_shared(self):
+        """Test metrics with the same formatting options share one formatter"""
+        formatter = _make_formatter(True, False, 1)
+        self.assertIs(formatter, _make_formatter(1, 0, 1))
+        self.assertIsNot(formatter, _make_formatter(True, False, 2))
+        self.assertEqual(75.5, formatter(0.755))
+        self.assertEqual(250.0, formatter(250.0))
+        self.assertIsInstance(_make_formatter(False, True, 2)(3.6), int)
+
 if __name__ == '__main__':
     unittest.main()
@@ -27,11 +27,19 @@ sys.modules['opentelemetry.metrics'] = MagicMock()
 sys.modules['opentelemetry.semantic_conventions'] = MagicMock()
 
 # Now import the module under test
-from common.otel_connector import InstanaOTelConnector
+from common.otel_connector import InstanaOTelConnector, GRPC_KEEPALIVE_OPTIONS
+from common.otel_connector import _load_opentelemetry, _grpc_compression_algorithms, _PROVIDER_CACHE
+
+# Bind the mocked OpenTelemetry names now so individual tests can patch them
+_load_opentelemetry()
 
 class TestInstanaOTelConnector(unittest.TestCase):
     """Test cases for the InstanaOTelConnector class."""
 
+    def setUp(self):
+        """Start each test without providers cached by earlier connectors."""
+        _PROVIDER_CACHE.clear()
+
     @patch('common.otel_connector.OTLPSpanExporter')
     @patch('common.otel_connector.TracerProvider')
     @patch('common.otel_connector.BatchSpanProcessor')
@@ -43,7 +51,7 @@ class TestInstanaOTelConnector(unittest.TestCase):
         """Test initialization and tracing setup."""
         # Setup mocks
         mock_tracer = MagicMock()
-        mock_get_tracer.return_value = mock_tracer
+        mock_tracer_provider.return_value.get_tracer.return_value = mock_tracer
         
         # Create connector
         connector = InstanaOTelConnector(
@@ -53,11 +61,16 @@ class TestInstanaOTelConnector(unittest.TestCase):
         )
         
         # Verify tracer setup
-        mock_span_exporter.assert_called_once_with(endpoint="test_host:1234", insecure=True)
+        mock_span_exporter.assert_called_once_with(endpoint="test_host:1234", insecure=True,
+                                                   compression=connector._grpc_compression,
+                                                   timeout=5.0,
+                                                   channel_options=GRPC_KEEPALIVE_OPTIONS)
         mock_tracer_provider.assert_called_once()
         mock_batch_processor.assert_called_once()
+        self.assertEqual(128, mock_batch_processor.call_args.kwargs['max_export_batch_size'])
+        self.assertEqual(10000, mock_batch_processor.call_args.kwargs['export_timeout_millis'])
         mock_set_tracer_provider.assert_called_once()
-        mock_get_tracer.assert_called_once()
+        mock_tracer_provider.return_value.get_tracer.assert_called_once()
         
         # Verify connector attributes
         self.assertEqual(connector.service_name, "test_service")
@@ -65,6 +78,247 @@ class TestInstanaOTelConnector(unittest.TestCase):
         self.assertEqual(connector.agent_port, 1234)
         self.assertEqual(connector.tracer, mock_tracer)
 
+    @patch('common.otel_connector.OTLPSpanExporter')
+    @patch('common.otel_connector.TracerProvider')
+    @patch('common.otel_connector.BatchSpanProcessor')
+    @patch('common.otel_connector.trace')
+    def test_batch_span_processor_settings(self, mock_trace, mock_batch_processor,
+                                           mock_tracer_provider, mock_span_exporter):
+        """Test BatchSpanProcessor settings come from env, then kwargs, and are clamped."""
+        env = {
+            'OTEL_BSP_MAX_QUEUE_SIZE': '1024',
+            'OTEL_BSP_MAX_EXPORT_BATCH_SIZE': '5000',
+            'OTEL_BSP_SCHEDULE_DELAY': 'soon',
+        }
+        with patch.dict(os.environ, env), \
+             patch.object(InstanaOTelConnector, '_setup_metrics'):
+            InstanaOTelConnector(
+                service_name="test_service",
+                agent_host="test_host",
+                agent_port=1234,
+                max_queue_size=64,
+                export_timeout_millis=10000
+            )
+
+        mock_batch_processor.assert_called_once_with(
+            mock_span_exporter.return_value,
+            max_queue_size=1024,
+            schedule_delay_millis=1000,
+            max_export_batch_size=1024,
+            export_timeout_millis=10000
+        )
+
+    @patch('common.otel_connector.OTLPSpanExporter')
+    @patch('common.otel_connector.TracerProvider')
+    @patch('common.otel_connector.BatchSpanProcessor')
+    @patch('common.otel_connector.trace')
+    @patch('common.otel_connector.OTLPMetricExporter')
+    @patch('common.otel_connector.PeriodicExportingMetricReader')
+    @patch('common.otel_connector.MeterProvider')
+    @patch('common.otel_connector.set_meter_provider')
+    @patch('common.otel_connector.Resource')
+    def test_providers_shared_per_service(self, mock_resource, mock_set_meter_provider, mock_meter_provider,
+                                          mock_reader, mock_metric_exporter, mock_trace,
+                                          mock_batch_processor, mock_tracer_provider,
+                                          mock_span_exporter):
+        """Test connectors with identical settings share providers until the last one shuts down."""
+        mock_tracer_provider.side_effect = lambda **kwargs: MagicMock()
+        mock_meter_provider.side_effect = lambda **kwargs: MagicMock()
+        mock_resource.create.side_effect = lambda attributes: MagicMock()
+
+        first = InstanaOTelConnector(service_name="test_service", agent_host="test_host", agent_port=1234)
+        second = InstanaOTelConnector(service_name="test_service", agent_host="test_host", agent_port=1234)
+        other = InstanaOTelConnector(service_name="other_service", agent_host="test_host", agent_port=1234)
+        # Any differing exporter or resource setting gets its own providers
+        uncompressed = InstanaOTelConnector(service_name="test_service", agent_host="test_host",
+                                            agent_port=1234, compression="none")
+        labelled = InstanaOTelConnector(service_name="test_service", agent_host="test_host",
+                                        agent_port=1234, resource_attributes={"deployment.environment": "test"})
+
+        self.assertIs(first.resource, second.resource)
+        self.assertIs(first._tracer_provider, second._tracer_provider)
+        self.assertIs(first._meter_provider, second._meter_provider)
+        for connector in (other, uncompressed, labelled):
+            self.assertIsNot(first._tracer_provider, connector._tracer_provider)
+            self.assertIsNot(first._meter_provider, connector._meter_provider)
+        self.assertEqual(4, mock_span_exporter.call_count)
+        self.assertEqual(4, mock_metric_exporter.call_count)
+        self.assertEqual(4, mock_resource.create.call_count)
+
+        # Both connectors report through one instrument per metric
+        first._metrics_registry.add("cpu_usage")
+        second._metrics_registry.add("cpu_usage")
+        second.record_metrics({"cpu_usage": 12.5})
+        self.assertEqual(12.5, first._metrics_state["cpu_usage"])
+        self.assertIs(first.create_observable("cpu_usage", "Gauge"),
+                      second.create_observable("cpu_usage", "Gauge"))
+
+        # The providers stay live while another connector still uses them
+        meter_provider = first._meter_provider
+        second.shutdown()
+        second.shutdown()
+        meter_provider.shutdown.assert_not_called()
+        third = InstanaOTelConnector(service_name="test_service", agent_host="test_host", agent_port=1234)
+        self.assertIs(meter_provider, third._meter_provider)
+
+        # The last connector stops them, and a stopped provider is never reused
+        first.shutdown()
+        third.shutdown()
+        meter_provider.shutdown.assert_called_once_with()
+        fourth = InstanaOTelConnector(service_name="test_service", agent_host="test_host", agent_port=1234)
+        self.assertIsNot(meter_provider, fourth._meter_provider)
+
+    @patch.object(InstanaOTelConnector, '_setup_tracing')
+    @patch.object(InstanaOTelConnector, '_setup_metrics')
+    @patch('common.otel_connector.Resource')
+    def test_resource_keeps_connector_attributes(self, mock_resource, mock_setup_metrics, mock_setup_tracing):
+        """Test each connector's own resource attributes reach its Resource."""
+        mock_resource.create.side_effect = lambda attributes: MagicMock(attributes=attributes)
+
+        first = InstanaOTelConnector(service_name="test_service", agent_host="test_host", agent_port=1234)
+        second = InstanaOTelConnector(service_name="test_service", agent_host="test_host", agent_port=1234,
+                                      service_namespace="Production",
+                                      resource_attributes={"deployment.environment": "prod"})
+
+        self.assertEqual("Unknown", first.resource.attributes["service.namespace"])
+        self.assertNotIn("deployment.environment", first.resource.attributes)
+        self.assertEqual("Production", second.resource.attributes["service.namespace"])
+        self.assertEqual("prod", second.resource.attributes["deployment.environment"])
+        self.assertEqual(second.service_id, second.resource.attributes["service.instance.id"])
+        # Custom attributes override the process-wide base
+        labelled = InstanaOTelConnector(service_name="test_service", resource_attributes={"host.name": "alias"})
+        self.assertEqual("alias", labelled.attributes["host.name"])
+        self.assertEqual(first.attributes["host.name"], second.attributes["host.name"])
+
+    @patch.object(InstanaOTelConnector, '_setup_tracing')
+    @patch.object(InstanaOTelConnector, '_setup_metrics')
+    def test_exporter_without_channel_options(self, mock_setup_metrics, mock_setup_tracing):
+        """Test exporters fall back to gRPC defaults only when channel options are unsupported."""
+        class LegacyExporter:
+            def __init__(self, endpoint, insecure, compression=None):
+                self.kwargs = dict(endpoint=endpoint, insecure=insecure)
+
+        class CurrentExporter:
+            def __init__(self, endpoint, insecure, compression=None, ca_file=None, channel_options=None):
+                if ca_file is not None and not isinstance(ca_file, str):
+                    raise TypeError("expected str, bytes or os.PathLike object for ca_file")
+                self.channel_options = channel_options
+
+        connector = InstanaOTelConnector(service_name="test_service")
+        exporter = connector._new_exporter(LegacyExporter, dict(endpoint="test_host:1234", insecure=True))
+        self.assertEqual(dict(endpoint="test_host:1234", insecure=True), exporter.kwargs)
+
+        # A TypeError caused by another argument is raised, not taken for missing support
+        with self.assertRaises(TypeError):
+            connector._new_exporter(CurrentExporter, dict(endpoint="test_host:1234", insecure=False, ca_file=42))
+        exporter = connector._new_exporter(CurrentExporter, dict(endpoint="test_host:1234", insecure=True))
+        self.assertEqual(GRPC_KEEPALIVE_OPTIONS, exporter.channel_options)
+
+    @patch.object(InstanaOTelConnector, '_setup_tracing')
+    @patch.object(InstanaOTelConnector, '_setup_metrics')
+    def test_otlp_exporter_kwargs(self, mock_setup_metrics, mock_setup_tracing):
+        """Test span and metric exporters share endpoint and TLS settings."""
+        connector = InstanaOTelConnector(
+            service_name="test_service",
+            agent_host="test_host",
+            agent_port=1234,
+            use_tls=True,
+            ca_cert_path="/certs/ca.crt",
+            client_cert_path="/certs/client.crt",
+            client_key_path="/certs/client.key"
+        )
+        kwargs = connector._otlp_exporter_kwargs()
+        self.assertEqual("https://test_host:1234", kwargs["endpoint"])
+        self.assertFalse(kwargs["insecure"])
+        self.assertEqual("/certs/ca.crt", kwargs["ca_file"])
+        self.assertEqual("/certs/client.crt", kwargs["cert_file"])
+        self.assertEqual("/certs/client.key", kwargs["key_file"])
+
+        connector.use_tls = False
+        kwargs = connector._otlp_exporter_kwargs()
+        self.assertEqual("test_host:1234", kwargs["endpoint"])
+        self.assertTrue(kwargs["insecure"])
+        self.assertNotIn("ca_file", kwargs)
+
+        with patch.dict(os.environ, {'OTEL_EXPORTER_OTLP_TIMEOUT': '2500'}):
+            connector = InstanaOTelConnector(service_name="test_service", otlp_timeout_millis=10000)
+        self.assertEqual(2.5, connector._otlp_exporter_kwargs()["timeout"])
+
+    @patch.object(InstanaOTelConnector, '_setup_tracing')
+    @patch.object(InstanaOTelConnector, '_setup_metrics')
+    def test_hostname_resolved_once(self, mock_setup_metrics, mock_setup_tracing):
+        """Test the hostname is looked up once however many connectors are created."""
+        from common.otel_connector import _hostname, _base_resource_attributes
+        _hostname.cache_clear()
+        _base_resource_attributes.cache_clear()
+        try:
+            with patch('common.otel_connector.socket.gethostname', return_value="host-a") as mock_gethostname:
+                first = InstanaOTelConnector(service_name="test_service")
+                second = InstanaOTelConnector(service_name="test_service_2")
+            mock_gethostname.assert_called_once_with()
+            self.assertEqual("host-a", first.attributes["host.name"])
+            self.assertEqual("host-a", second.attributes["host.name"])
+        finally:
+            _hostname.cache_clear()
+            _base_resource_attributes.cache_clear()
+
+    def test_strtobool(self):
+        """Test strtobool accepts the distutils spellings and rejects anything else."""
+        from common.otel_connector import strtobool
+        self.assertIs(True, strtobool("Yes"))
+        self.assertIs(True, strtobool("1"))
+        self.assertIs(False, strtobool("OFF"))
+        self.assertIs(False, strtobool("f"))
+        with self.assertRaises(ValueError):
+            strtobool("maybe")
+
+    @patch.object(InstanaOTelConnector, '_setup_tracing')
+    @patch.object(InstanaOTelConnector, '_setup_metrics')
+    def test_use_tls_setting(self, mock_setup_metrics, mock_setup_tracing):
+        """Test USE_TLS overrides the argument and invalid values fall back to it."""
+        for env_value, use_tls, expected in (("YES", False, True), ("off", True, False),
+                                             ("maybe", True, True), ("", True, True)):
+            with patch.dict(os.environ, {'USE_TLS': env_value}):
+                connector = InstanaOTelConnector(service_name="test_service", use_tls=use_tls)
+            self.assertIs(expected, connector.use_tls, env_value)
+
+    @patch.object(InstanaOTelConnector, '_setup_tracing')
+    @patch.object(InstanaOTelConnector, '_setup_metrics')
+    def test_export_compression(self, mock_setup_metrics, mock_setup_tracing):
+        """Test exports are gzip-compressed by default and configurable via env."""
+        mock_grpc = MagicMock()
+        _grpc_compression_algorithms.cache_clear()
+        with patch.dict(sys.modules, {'grpc': mock_grpc}):
+            connector = InstanaOTelConnector(service_name="test_service")
+            self.assertEqual('gzip', connector.compression)
+            self.assertEqual(mock_grpc.Compression.Gzip, connector._grpc_compression)
+
+            with patch.dict(os.environ, {'OTEL_EXPORTER_OTLP_COMPRESSION': 'none'}):
+                connector = InstanaOTelConnector(service_name="test_service", compression="gzip")
+            self.assertEqual(mock_grpc.Compression.NoCompression, connector._grpc_compression)
+
+            with patch.dict(os.environ, {'OTEL_EXPORTER_OTLP_COMPRESSION': 'snappy'}):
+                connector = InstanaOTelConnector(service_name="test_service")
+            self.assertEqual('gzip', connector.compression)
+        _grpc_compression_algorithms.cache_clear()
+
+    @patch.object(InstanaOTelConnector, '_setup_tracing')
+    @patch.object(InstanaOTelConnector, '_setup_metrics')
+    def test_missing_grpc_warns_once(self, mock_setup_metrics, mock_setup_tracing):
+        """Test a missing grpc package is reported once, not per exporter or connector."""
+        _grpc_compression_algorithms.cache_clear()
+        with patch.dict(sys.modules, {'grpc': None}), \
+             patch('common.otel_connector.logger') as mock_logger:
+            first = InstanaOTelConnector(service_name="test_service")
+            second = InstanaOTelConnector(service_name="test_service")
+            first._otlp_exporter_kwargs()
+        _grpc_compression_algorithms.cache_clear()
+
+        self.assertIsNone(first._grpc_compression)
+        self.assertIsNone(second._otlp_exporter_kwargs()['compression'])
+        warnings = [args[0] for args, _ in mock_logger.warning.call_args_list if 'grpc' in args[0]]
+        self.assertEqual(["grpc package not available, exporting without compression"], warnings)
+
     @patch('common.otel_connector.OTLPMetricExporter')
     @patch('common.otel_connector.PeriodicExportingMetricReader')
     @patch('common.otel_connector.MeterProvider')
@@ -75,8 +329,7 @@ class TestInstanaOTelConnector(unittest.TestCase):
         """Test metrics setup."""
         # Setup mocks
         mock_meter = MagicMock()
-        mock_meter_provider_instance = MagicMock()
-        mock_get_meter_provider.return_value = mock_meter_provider_instance
+        mock_meter_provider_instance = mock_meter_provider.return_value
         mock_meter_provider_instance.get_meter.return_value = mock_meter
         
         # Create connector with mocked tracing
@@ -88,8 +341,15 @@ class TestInstanaOTelConnector(unittest.TestCase):
             )
         
         # Verify metrics setup
-        mock_exporter.assert_called_once_with(endpoint="test_host:1234", insecure=True)
-        mock_reader.assert_called_once()
+        mock_exporter.assert_called_once_with(endpoint="test_host:1234", insecure=True,
+                                              compression=connector._grpc_compression,
+                                              timeout=5.0,
+                                              channel_options=GRPC_KEEPALIVE_OPTIONS)
+        mock_reader.assert_called_once_with(
+            mock_exporter.return_value,
+            export_interval_millis=60000,
+            export_timeout_millis=30000
+        )
         mock_meter_provider.assert_called_once()
         mock_set_meter_provider.assert_called_once()
         mock_meter_provider_instance.get_meter.assert_called_once()
@@ -125,6 +385,7 @@ class TestInstanaOTelConnector(unittest.TestCase):
         self.assertEqual(connector._metrics_state["cpu_usage"], 10.5)
         self.assertEqual(connector._metrics_state["memory_usage"], 20.3)
         self.assertEqual(connector._metrics_state["process_count"], 3)
+        self.assertIs(type(connector._metrics_state["process_count"]), int)
         
         # Test with string metrics (valid metric in registry)
         metrics = {
@@ -148,6 +409,22 @@ class TestInstanaOTelConnector(unittest.TestCase):
         self.assertEqual(len(connector._metrics_state), old_state_length)
         self.assertNotIn("unknown_metric", connector._metrics_state)
 
+        # Non-numeric values keep the previous state and skip debug formatting
+        with patch('common.otel_connector.logger') as mock_logger:
+            mock_logger.isEnabledFor.return_value = False
+            connector.record_metrics({"cpu_usage": "n/a", "memory_usage": None, "process_count": "7"})
+        self.assertEqual(connector._metrics_state["cpu_usage"], 10.5)
+        self.assertEqual(connector._metrics_state["memory_usage"], 20.3)
+        self.assertEqual(connector._metrics_state["process_count"], 7.0)
+        mock_logger.debug.assert_not_called()
+
+        # Negative, scientific and Decimal values are converted rather than skipped
+        from decimal import Decimal
+        connector.record_metrics({"cpu_usage": "-1.5", "memory_usage": "2e3", "process_count": Decimal("4")})
+        self.assertEqual(connector._metrics_state["cpu_usage"], -1.5)
+        self.assertEqual(connector._metrics_state["memory_usage"], 2000.0)
+        self.assertEqual(connector._metrics_state["process_count"], 4.0)
+
     @patch.object(InstanaOTelConnector, '_setup_tracing')
     @patch.object(InstanaOTelConnector, '_setup_metrics')
     def test_create_span(self, mock_setup_metrics, mock_setup_tracing):
@@ -173,9 +450,21 @@ class TestInstanaOTelConnector(unittest.TestCase):
         )
         self.assertEqual(span, mock_span)
 
+    @patch.object(InstanaOTelConnector, '_setup_tracing')
+    @patch.object(InstanaOTelConnector, '_setup_metrics')
+    def test_create_span_without_opentelemetry(self, mock_setup_metrics, mock_setup_tracing):
+        """Test create_span returns a shared no-op context manager without OpenTelemetry."""
+        connector = InstanaOTelConnector(service_name="test_service")
+        with patch('common.otel_connector.OPENTELEMETRY_AVAILABLE', False):
+            first = connector.create_span("first")
+            second = connector.create_span("second")
+        self.assertIs(first, second)
+        with first as span:
+            self.assertIsNone(span)
+
     @patch.object(InstanaOTelConnector, '_setup_tracing')
     def test_create_metric_callback_generator(self, mock_setup_tracing):
-        """Test that _create_metric_callback correctly produces a generator that yields values."""
+        """Test that _create_metric_callback produces a callback that returns observed values."""
         # Create connector
         connector = InstanaOTelConnector(
             service_name="test_service",
@@ -204,6 +493,25 @@ class TestInstanaOTelConnector(unittest.TestCase):
         result = list(callback(mock_options))
         self.assertEqual(len(result), 0)
         
+    @patch.object(InstanaOTelConnector, '_setup_tracing')
+    @patch.object(InstanaOTelConnector, '_setup_metrics')
+    def test_metric_callback_formatting(self, mock_setup_metrics, mock_setup_tracing):
+        """Test metric callbacks apply the manifest formatting to the current state."""
+        connector = InstanaOTelConnector(service_name="test_service")
+        connector._metrics_state.update({"cpu": 250.0, "threads": "12.7", "load": 1.23456})
+
+        with patch('common.otel_connector.Observation', side_effect=lambda value: value):
+            cpu = connector._create_metric_callback("cpu", is_percentage=True, decimal_places=3)
+            threads = connector._create_metric_callback("threads", is_counter=True)
+            load = connector._create_metric_callback("load", decimal_places=2)
+            self.assertEqual([2.5], list(cpu(None)))
+            self.assertEqual([12], list(threads(None)))
+            self.assertEqual([1.23], list(load(None)))
+
+            # Callbacks read the live state, so later updates are observed
+            connector._metrics_state["load"] = 2.0
+            self.assertEqual([2.0], list(load(None)))
+
     @patch.object(InstanaOTelConnector, '_setup_tracing')
     def test_percentage_value_handling(self, mock_setup_tracing):
         """Test that percentage values are properly converted."""
@@ -310,12 +618,47 @@ class TestInstanaOTelConnector(unittest.TestCase):
             # Call register_observable_metrics explicitly 
             connector._register_observable_metrics()
             
-            # Verify create_observable was called for each metric
-            self.assertEqual(mock_create_observable.call_count, 2)
-            
             # Verify metrics were added to registry
             self.assertIn('cpu_usage', connector._metrics_registry)
             self.assertIn('process_count', connector._metrics_registry)
+            
+            # Instruments are only created once a metric has a value
+            mock_create_observable.assert_not_called()
+            connector.record_metrics({'cpu_usage': 12.5})
+            mock_create_observable.assert_called_once()
+            self.assertEqual('cpu_usage', mock_create_observable.call_args.kwargs['name'])
+            
+            connector.record_metrics({'cpu_usage': 13.0, 'process_count': 4})
+            self.assertEqual(mock_create_observable.call_count, 2)
+            self.assertNotIn('cpu_usage', connector._pending_observables)
+            self.assertNotIn('process_count', connector._pending_observables)
+
+    @patch.object(InstanaOTelConnector, '_setup_tracing')
+    @patch.object(InstanaOTelConnector, '_setup_metrics')
+    def test_pending_observable_retried(self, mock_setup_metrics, mock_setup_tracing):
+        """Test a metric stays pending until its instrument is actually created."""
+        connector = InstanaOTelConnector(service_name="test_service")
+        connector._metrics_registry.add('cpu_usage')
+        connector._pending_observables['cpu_usage'] = {
+            'otel_type': 'Gauge', 'unit': '%', 'decimal_places': 2, 'is_percentage': True,
+            'is_counter': False, 'description': 'CPU usage', 'display_name': 'CPU Usage'
+        }
+        
+        instrument = MagicMock()
+        with patch.object(connector, 'create_observable',
+                          side_effect=[None, RuntimeError("meter failed"), instrument]) as mock_create_observable:
+            # Meter not ready yet
+            connector.record_metrics({'cpu_usage': 12.5})
+            self.assertIn('cpu_usage', connector._pending_observables)
+            # Instrument creation raised
+            connector.record_metrics({'cpu_usage': 13.0})
+            self.assertIn('cpu_usage', connector._pending_observables)
+            
+            connector.record_metrics({'cpu_usage': 14.0})
+            self.assertNotIn('cpu_usage', connector._pending_observables)
+            connector.record_metrics({'cpu_usage': 15.0})
+        
+        self.assertEqual(3, mock_create_observable.call_count)
 
     @patch.object(InstanaOTelConnector, '_setup_tracing')
     @patch.object(InstanaOTelConnector, '_setup_metrics')
@@ -368,6 +711,11 @@ class TestInstanaOTelConnector(unittest.TestCase):
                 description="Test updown counter metric"
             )
             self.assertIsNotNone(result)
+
+            # Creating the same metric again returns the cached instrument
+            again = connector.create_observable(name="test_updown", otel_type="UpDownCounter")
+            self.assertIs(result, again)
+            connector.meter.create_observable_up_down_counter.assert_called_once()
     
     @patch.object(InstanaOTelConnector, '_setup_tracing')
     @patch.object(InstanaOTelConnector, '_setup_metrics')
@@ -382,14 +730,28 @@ class TestInstanaOTelConnector(unittest.TestCase):
         
         # Mock providers
         connector._tracer_provider = MagicMock()
-        connector._meter_provider = MagicMock()
+        connector._meter_provider = connector._providers['meter'] = MagicMock()
         
         # Call shutdown
         connector.shutdown()
         
         # Verify flush calls
-        connector._tracer_provider.force_flush.assert_called_once()
-        connector._meter_provider.force_flush.assert_called_once()
+        connector._tracer_provider.force_flush.assert_called_once_with(timeout_millis=5000)
+        connector._meter_provider.force_flush.assert_called_once_with(timeout_millis=5000)
+        connector._meter_provider.shutdown.assert_called_once_with()
+
+    @patch.object(InstanaOTelConnector, '_setup_tracing')
+    @patch.object(InstanaOTelConnector, '_setup_metrics')
+    def test_metric_export_interval(self, mock_setup_metrics, mock_setup_tracing):
+        """Test the metric export interval is configurable and bounds the export timeout."""
+        with patch.dict(os.environ, {'OTEL_METRIC_EXPORT_INTERVAL': '10000'}):
+            connector = InstanaOTelConnector(service_name="test_service")
+        self.assertEqual(10000, connector.metric_export_interval_millis)
+        self.assertEqual(9000, connector.metric_export_timeout_millis)
+
+        connector = InstanaOTelConnector(service_name="test_service", metric_export_interval_millis=500)
+        self.assertEqual(2000, connector.metric_export_interval_millis)
+        self.assertEqual(1000, connector.metric_export_timeout_millis)
 
 if __name__ == '__main__':
     unittest.main()
@@ -12,7 +12,9 @@ import unittest
 import tempfile
 import os
 import sqlite3
-from common.metadata_store import MetadataStore
+import threading
+from unittest.mock import patch
+from common.metadata_store import MetadataStore, FORMAT_RULES_CACHE_TTL
 from common.toml_utils import get_manifest_value
 
 # Get schema version from manifest.toml
@@ -127,7 +129,7 @@ class TestSchemaMigration(unittest.TestCase):
         
         metric_info = store2.get_metric_info(service_id, "test_metric")
         self.assertIsNotNone(metric_info)
-        self.assertEqual(metric_info['id'], metric_id)
+        self.assertEqual(metric_info.id, metric_id)
 
     def test_schema_version_operations(self):
         """Test schema version getting and setting operations."""
@@ -161,6 +163,53 @@ class TestSchemaMigration(unittest.TestCase):
         expected_patterns = {'cpu', '_', 'word_start'}
         self.assertTrue(expected_patterns.issubset(patterns))
 
+    def test_format_rules_cache(self):
+        """Test that format rules are served from memory until the TTL expires."""
+        store = MetadataStore(self.db_path)
+
+        rules = store.get_format_rules()
+        with store._get_db_connection() as conn:
+            conn.execute("DELETE FROM format_rules WHERE pattern = 'cpu'")
+        self.assertIs(rules, store.get_format_rules())
+
+        # Once the cached entry is older than the TTL the table is read again
+        store._format_rules_cache_time -= FORMAT_RULES_CACHE_TTL
+        patterns = {rule['pattern'] for rule in store.get_format_rules()}
+        self.assertNotIn('cpu', patterns)
+        store.close()
+
+    def test_format_rules_fallback_cached(self):
+        """Test that the default rules are cached when the database cannot be read."""
+        store = MetadataStore(self.db_path)
+        store._invalidate_format_rules_cache()
+
+        with patch.object(store, '_get_db_connection', side_effect=sqlite3.OperationalError("locked")) as conn_mock:
+            first = store.get_format_rules()
+            second = store.get_format_rules()
+
+        self.assertEqual(1, conn_mock.call_count)
+        self.assertIs(first, second)
+        self.assertEqual({'cpu', '_', 'word_start'}, {rule['pattern'] for rule in first})
+        store.close()
+
+    def test_format_rules_fallback_isolated(self):
+        """Test that modifying fallback rules leaves the seeded defaults untouched."""
+        store = MetadataStore(self.db_path)
+        store._invalidate_format_rules_cache()
+
+        with patch.object(store, '_get_db_connection', side_effect=sqlite3.OperationalError("locked")):
+            rules = store.get_format_rules()
+        rules[0]['replacement'] = 'changed'
+        rules.clear()
+        store.close()
+
+        # A database created afterwards is still seeded with the original rules
+        os.remove(self.db_path)
+        fresh = MetadataStore(self.db_path)
+        cpu_rule = next(rule for rule in fresh.get_format_rules() if rule['pattern'] == 'cpu')
+        self.assertEqual('CPU', cpu_rule['replacement'])
+        fresh.close()
+
     def test_migration_error_handling(self):
         """Test error handling during migration."""
         # Create an invalid database file
@@ -196,6 +245,140 @@ class TestSchemaMigration(unittest.TestCase):
                 self.assertEqual(cursor1.fetchone()[0], 1)
                 self.assertEqual(cursor2.fetchone()[0], 2)
         
+    def test_connection_pragmas(self):
+        """Test that the database uses WAL and connections are tuned."""
+        store = MetadataStore(self.db_path)
+
+        with store._get_db_connection() as conn:
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+            # synchronous=NORMAL is reported as 1
+            self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 1)
+            self.assertEqual(conn.execute("PRAGMA busy_timeout").fetchone()[0], 5000)
+            # temp_store=MEMORY is reported as 2
+            self.assertEqual(conn.execute("PRAGMA temp_store").fetchone()[0], 2)
+            self.assertEqual(conn.execute("PRAGMA mmap_size").fetchone()[0], 268435456)
+            self.assertEqual(conn.execute("PRAGMA wal_autocheckpoint").fetchone()[0], 200)
+            self.assertEqual(conn.execute("PRAGMA journal_size_limit").fetchone()[0], 6144000)
+
+        store.close()
+
+    def test_connection_reuse(self):
+        """Test that a thread reuses one connection until the store is closed."""
+        store = MetadataStore(self.db_path)
+
+        with store._get_db_connection() as conn1:
+            pass
+        with store._get_db_connection() as conn2:
+            self.assertIs(conn1, conn2)
+
+        store.close()
+
+        # Closing releases the connection; the next call opens a fresh one
+        with self.assertRaises(sqlite3.ProgrammingError):
+            conn1.execute("SELECT 1")
+        with store._get_db_connection() as conn3:
+            self.assertIsNot(conn1, conn3)
+            self.assertEqual(conn3.execute("SELECT 1").fetchone()[0], 1)
+        store.close()
+
+    def test_connection_per_thread(self):
+        """Test that each thread reuses its own connection and close() releases all of them."""
+        store = MetadataStore(self.db_path)
+        seen = {}
+
+        def worker(key):
+            with store._get_db_connection() as first:
+                pass
+            with store._get_db_connection() as second:
+                self.assertIs(first, second)
+            seen[key] = first
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertIsNot(seen[0], seen[1])
+        store.close()
+        for conn in seen.values():
+            with self.assertRaises(sqlite3.ProgrammingError):
+                conn.execute("SELECT 1")
+
+    def test_finished_thread_connections_released(self):
+        """Test that connections of exited threads are closed when a new one is opened."""
+        store = MetadataStore(self.db_path)
+        seen = []
+
+        def worker():
+            with store._get_db_connection() as conn:
+                seen.append(conn)
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+        self.assertIn(thread, store._connections)
+
+        # A connection opened by another thread prunes the finished one
+        second = threading.Thread(target=worker)
+        second.start()
+        second.join()
+        with self.assertRaises(sqlite3.ProgrammingError):
+            seen[0].execute("SELECT 1")
+        self.assertNotIn(thread, store._connections)
+        store.close()
+
+    def test_metric_lookups_use_index(self):
+        """Test that metric lookups and format rules are served by indexes."""
+        store = MetadataStore(self.db_path)
+
+        queries = [
+            ("SELECT id FROM metrics WHERE service_id = ? AND name = ?", ("s", "m")),
+            ("SELECT name, id FROM metrics WHERE service_id = ?", ("s",)),
+            ("SELECT name, id, display_name FROM metrics WHERE service_id = ?", ("s",)),
+        ]
+        with store._get_db_connection() as conn:
+            for sql, params in queries:
+                plan = " ".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+                self.assertIn("INDEX", plan)
+                self.assertNotIn("SCAN", plan)
+
+            # Per-service ID lookups never touch the table itself
+            plan = " ".join(row[3] for row in conn.execute(
+                "EXPLAIN QUERY PLAN " + queries[2][0], queries[2][1]
+            ))
+            self.assertIn("COVERING INDEX idx_metrics_service_name_display", plan)
+
+            # Adding the indexes gathered planner statistics
+            self.assertIsNotNone(conn.execute(
+                "SELECT name FROM sqlite_master WHERE name = 'sqlite_stat1'"
+            ).fetchone())
+
+            # Format rules are read in index order rather than sorted per query
+            plan = " ".join(row[3] for row in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT pattern FROM format_rules ORDER BY priority DESC"
+            ))
+            self.assertIn("idx_format_rules_priority", plan)
+            self.assertNotIn("TEMP B-TREE", plan)
+        store.close()
+
+    def test_write_transaction_takes_write_lock(self):
+        """Test that write transactions lock out other writers and roll back on error."""
+        store = MetadataStore(self.db_path)
+        other = sqlite3.connect(self.db_path, timeout=0)
+
+        with self.assertRaises(RuntimeError):
+            with store._write_transaction() as conn:
+                # Held from BEGIN, before this transaction has written anything
+                with self.assertRaises(sqlite3.OperationalError):
+                    other.execute("INSERT INTO hosts (id, hostname) VALUES ('h2', 'other')")
+                conn.execute("INSERT INTO hosts (id, hostname) VALUES ('h1', 'mine')")
+                raise RuntimeError("abort")
+
+        self.assertEqual(0, other.execute("SELECT COUNT(*) FROM hosts").fetchone()[0])
+        other.close()
+        store.close()
+
     def test_connection_manager_exception_safety(self):
         """Test that connections are properly cleaned up even when exceptions occur."""
         store = MetadataStore(self.db_path)